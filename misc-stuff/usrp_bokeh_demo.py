@@ -8,10 +8,9 @@ import pysdr # our python package
 import pysdruhd as uhd # nathans amazing uhd wrapper
 import numpy as np
 import time 
+import sys
 from scipy.signal import firwin # FIR filter design using the window method
-from bokeh.layouts import column, row, gridplot, Spacer, widgetbox
-from bokeh.models import Select, TextInput
-from multiprocessing import Process, Manager, Queue
+from multiprocessing import Process
 
 ##############
 # Parameters #
@@ -22,95 +21,103 @@ gain = 50
 fft_size = 512               # output size of fft, the input size is the samples_per_batch
 waterfall_samples = 200      # number of rows of the waterfall
 samples_in_time_plots = 500  # should be less than samples per batch (2044 for B200)
+constellation_bins = 128     # the IQ plot is a constellation_bins x constellation_bins density image
+pre_trigger_samples = 100    # how much of the time sink comes from before the trigger point
 gui_refresh_period = 0.1  # [seconds] time between updates of GUIs, which means what percent of samples we are actually visualizing
+headless = '--headless' in sys.argv # no GUI, the DSP results get written to dsp_frames.frames instead (read it back with pysdr.read_frame_file)
 
 ##############
 # SET UP GUI #
 ##############
 
-# Frequncy Sink (line plot)
-fft_plot = pysdr.base_plot('Freq [MHz]', 'PSD [dB]', 'Frequency Sink', disable_horizontal_zooming=True) 
-f = (np.linspace(-samp_rate/2.0, samp_rate/2.0, fft_size) + center_freq)/1e6
-fft_plot._input_buffer['y'] = np.zeros(fft_size) # this buffer is how the DSP sends data to the plot in realtime
-fft_line = fft_plot.line(f, np.zeros(fft_size), color="aqua", line_width=1) # set x values but use dummy values for y
-
-# Time Sink (line plot)
-time_plot = pysdr.base_plot('Time [ms]', ' ', 'Time Sink', disable_horizontal_zooming=True) 
-t = np.linspace(0.0, samples_in_time_plots / samp_rate, samples_in_time_plots) * 1e3 # in ms
-time_plot._input_buffer['i'] = np.zeros(samples_in_time_plots) # I buffer (time domain)
-timeI_line = time_plot.line(t, np.zeros(len(t)), color="aqua", line_width=1) # set x values but use dummy values for y
-time_plot._input_buffer['q'] = np.zeros(samples_in_time_plots) # Q buffer (time domain)
-timeQ_line = time_plot.line(t, np.zeros(len(t)), color="red", line_width=1) # set x values but use dummy values for y
-
-# Waterfall Sink ("image" plot)
-waterfall_plot = pysdr.base_plot(' ', 'Time', 'Waterfall', disable_all_zooming=True) 
-waterfall_plot._set_x_range(0, fft_size) # Bokeh tries to automatically figure out range, but in this case we need to specify it
-waterfall_plot._set_y_range(0, waterfall_samples)
-waterfall_plot.axis.visible = False # i couldn't figure out how to update x axis when freq changes, so just hide them for now
-waterfall_plot._input_buffer['waterfall'] = [np.ones((waterfall_samples, fft_size))*-100.0] # waterfall buffer, has to be in list form
-waterfall_data = waterfall_plot.image(image = waterfall_plot._input_buffer['waterfall'],  # input 
-                                      x = 0, # start of x
-                                      y = 0, # start of y
-                                      dw = fft_size, # size of x
-                                      dh = waterfall_samples, # size of y
-                                      palette = "Spectral9") # closest thing to matlab's jet    
-
-# IQ/Constellation Sink ("circle" plot)
-iq_plot = pysdr.base_plot(' ', ' ', 'IQ Plot')
-#iq_plot._set_x_range(-1.0, 1.0) # this is to keep it fixed at -1 to 1. you can also just zoom out with mouse wheel and it will stop auto-ranging
-#iq_plot._set_y_range(-1.0, 1.0)
-iq_plot._input_buffer['i'] = np.zeros(samples_in_time_plots) # I buffer (time domain)
-iq_plot._input_buffer['q'] = np.zeros(samples_in_time_plots) # I buffer (time domain)
-iq_data = iq_plot.circle(np.zeros(samples_in_time_plots), 
-                         np.zeros(samples_in_time_plots),
-                         line_alpha=0.0, # setting line_width=0 didn't make it go away, but this works
-                         fill_color="aqua",
-                         fill_alpha=0.5, 
-                         size=4) # size of circles
-
-# Utilization bar (standard plot defined in gui.py)
-utilization_plot = pysdr.utilization_bar(1.0) # sets the top at 10% instead of 100% so we can see it move
-utilization_plot._input_buffer['y'] = [0.0] # float between 0 and 1, used to store how the process_samples is keeping up
-utilization_data = utilization_plot.quad(top=utilization_plot._input_buffer['y'], bottom=[0], left=[0], right=[1], color="#B3DE69") #adds 1 rectangle
-
-# Queue used to send usrp commands from Bokeh thread to the USRP thread
-usrp_command_queue = Queue() 
-
-def gain_callback(attr, old, new):
-    gain = new # set new gain (leave it as a string)
-    print("Setting gain to ", gain)
-    #command = 'set_gain("A:A",' + gain + ')' # pysdruhd version
-    command = 'set_gain(' + gain + ')'
-    usrp_command_queue.put(command)
-
-def freq_callback(attr, old, new):
-    center_freq = float(new) # TextInput provides a string
-    f = np.linspace(-samp_rate/2.0, samp_rate/2.0, fft_size) + center_freq
-    fft_line.data_source.data['x'] = f/1e6 # update x axis of freq sink
-    print("Setting freq to ", center_freq)
-    #command = 'set_frequency("A:A",' + str(center_freq) + ')' # pysdruhd version
-    command = 'set_center_freq(' + str(center_freq) + ')'
-    usrp_command_queue.put(command)
-
-# gain selector
-gain_select = Select(title="Gain:", value=str(gain), options=[str(i*10) for i in range(8)])
-gain_select.on_change('value', gain_callback)
-
-# center_freq TextInput
-freq_input = TextInput(value=str(center_freq), title="Center Freq [Hz]")
-freq_input.on_change('value', freq_callback)
-
-widgets = row([widgetbox(gain_select, freq_input), utilization_plot]) # widgetbox() makes them a bit tighter grouped than column()
-plots = gridplot([[fft_plot, time_plot], [waterfall_plot, iq_plot]], sizing_mode="scale_width", ) # Spacer(width=20, sizing_mode="fixed")
-
-# This function gets called periodically, and is how the "real-time streaming mode" works   
-def plot_update():  
-    timeI_line.data_source.data['y'] = time_plot._input_buffer['i'] # send most recent I to time sink
-    timeQ_line.data_source.data['y'] = time_plot._input_buffer['q'] # send most recent Q to time sink
-    iq_data.data_source.data = {'x': iq_plot._input_buffer['i'], 'y': iq_plot._input_buffer['q']} # send I and Q in one step using dict
-    fft_line.data_source.data['y'] = fft_plot._input_buffer['y'] # send most recent psd to freq sink
-    waterfall_data.data_source.data['image'] = waterfall_plot._input_buffer['waterfall'] # send waterfall 2d array to waterfall sink
-    utilization_data.data_source.data['top'] = utilization_plot._input_buffer['y'] # send most recent utilization level (only need to adjust top of rectangle)
+# Shared-memory channel that carries the DSP results to the GUI, written in place by the DSP process and read without copies by plot_update
+dsp_channel = pysdr.shared_channel({'psd': (fft_size, np.float32),
+                                    'i': (samples_in_time_plots, np.float32),
+                                    'q': (samples_in_time_plots, np.float32),
+                                    'constellation': ((constellation_bins, constellation_bins), np.uint8),
+                                    'utilization': (1, np.float32),
+                                    'display_fraction': (1, np.float32)})
+
+# Command channel used to send tune/gain requests from the Bokeh thread to the USRP thread, they get applied between packets without stopping the stream
+usrp_commands = pysdr.command_channel()
+
+# builds the plots, widgets and plot_update() that reads the channel, only called when there is a GUI, so headless mode
+#   never imports or builds anything Bokeh
+def build_gui():
+    from bokeh.layouts import column, row, gridplot, Spacer, widgetbox
+    from bokeh.models import Select, TextInput
+
+    # Frequncy Sink (line plot)
+    fft_plot = pysdr.base_plot('Freq [MHz]', 'PSD [dB]', 'Frequency Sink', disable_horizontal_zooming=True, input_buffer=dsp_channel) # the channel is how the DSP sends data to the plot in realtime
+    f = (np.linspace(-samp_rate/2.0, samp_rate/2.0, fft_size) + center_freq)/1e6
+    fft_line = fft_plot.line(f, np.zeros(fft_size), color="aqua", line_width=1) # set x values but use dummy values for y
+
+    # Time Sink (line plot), triggered like an oscilloscope so the trace holds still
+    time_plot = pysdr.triggered_time_sink(samples_in_time_plots, samp_rate, pre_trigger=pre_trigger_samples, input_buffer=dsp_channel)
+
+    # Waterfall Sink ("image" plot), the history lives in the browser and only new rows get sent, as uint8
+    waterfall_plot = pysdr.waterfall_sink(fft_size, waterfall_samples, floor=-100.0, ceiling=0.0, input_buffer=dsp_channel)
+    last_frame_id = 0 # newest frame that has been added to the waterfall
+
+    # IQ/Constellation Sink (density "image" plot), built from every sample of the batch rather than a few hundred circles
+    iq_plot = pysdr.constellation_density_sink(constellation_bins, max_amplitude=1.0, input_buffer=dsp_channel)
+
+    # Utilization bar (standard plot defined in gui.py)
+    utilization_plot = pysdr.utilization_bar(1.0, input_buffer=dsp_channel, num_bars=2) # sets the top at 10% instead of 100% so we can see it move
+    utilization_data = utilization_plot.quad(top=[0.0], bottom=[0], left=[0], right=[1], color="#B3DE69") #adds 1 rectangle, top is a float between 0 and 1 showing how the process_samples is keeping up
+    fraction_data = utilization_plot.quad(top=[1.0], bottom=[0], left=[1], right=[2], color="aqua") # 2nd rectangle, fraction of batches the load shedder lets the display process
+
+    def gain_callback(attr, old, new):
+        gain = float(new) # Select provides a string
+        print("Setting gain to ", gain)
+        usrp_commands.set_gain(gain)
+
+    def freq_callback(attr, old, new):
+        center_freq = float(new) # TextInput provides a string
+        f = np.linspace(-samp_rate/2.0, samp_rate/2.0, fft_size) + center_freq
+        fft_line.data_source.data['x'] = f/1e6 # update x axis of freq sink
+        print("Setting freq to ", center_freq)
+        usrp_commands.set_center_freq(center_freq, delay=0.01) # timed command, so the first sample at the new freq gets tagged exactly
+
+    # gain selector
+    gain_select = Select(title="Gain:", value=str(gain), options=[str(i*10) for i in range(8)])
+    gain_select.on_change('value', gain_callback)
+
+    # center_freq TextInput
+    freq_input = TextInput(value=str(center_freq), title="Center Freq [Hz]")
+    freq_input.on_change('value', freq_callback)
+
+    widgets = row([widgetbox(gain_select, freq_input), utilization_plot]) # widgetbox() makes them a bit tighter grouped than column()
+    plots = gridplot([[fft_plot, time_plot], [waterfall_plot, iq_plot]], sizing_mode="scale_width", ) # Spacer(width=20, sizing_mode="fixed")
+
+    # updaters only send what changed, as float32 binary arrays, instead of replacing whole columns every time
+    fft_updater = pysdr.source_updater(fft_line)
+    utilization_updater = pysdr.source_updater(utilization_data)
+    fraction_updater = pysdr.source_updater(fraction_data)
+
+    # This function gets called periodically, and is how the "real-time streaming mode" works   
+    def plot_update():  
+        nonlocal last_frame_id
+        new_frames = dsp_channel.read_since(last_frame_id) # every PSD computed since the last refresh becomes a waterfall row
+        if not new_frames:
+            return False # nothing new, lets the refresh controller back off
+        waterfall_plot._add_rows([frame['psd'] for frame_id, frame in new_frames])
+        last_frame_id = new_frames[-1][0]
+        frame_id, frame = dsp_channel.read() # most recent frame, these are views into shared memory so nothing gets copied or pickled
+        if frame is None:
+            return False # DSP hasn't produced anything yet
+        time_plot._update(frame['i'] + 1j * frame['q']) # send most recent triggered capture to time sink
+        iq_plot._update(frame['constellation']) # send the constellation density image
+        fft_updater.update(y=frame['psd']) # send most recent psd to freq sink
+        utilization_updater.update(top=frame['utilization']) # send most recent utilization level (only need to adjust top of rectangle)
+        fraction_updater.update(top=frame['display_fraction'])
+
+    return widgets, plots, plot_update
+
+# DSP load for the refresh controller, the GUI refreshes less often while the DSP is busy
+def dsp_utilization():
+    frame_id, frame = dsp_channel.read()
+    return None if frame is None else float(frame['utilization'][0])
 
 
 ###################
@@ -120,31 +127,40 @@ def plot_update():
 # create a streaming-type FIR filter (this should act the same as a FIR filter block in GNU Radio)
 taps = firwin(numtaps=100, cutoff=200e3, nyq=samp_rate) # scipy's filter designer
 prefilter = pysdr.fir_filter(taps)
-accumulator = pysdr.accumulator(int(gui_refresh_period * samp_rate)) # accumulates batches of samples so we can process more at a time. arg is min amount to store
+accumulator = pysdr.accumulator(int(gui_refresh_period * samp_rate), max_batch=2044) # max_batch is the B200 packet size, so the ring is sized up front. accumulates batches of samples so we can process more at a time. arg is min amount to store
+shedder = pysdr.load_shedder(samp_rate) # adapts how many blocks the display path processes to the measured load
+settle_gate = pysdr.settle_gate(int(1e-3 * samp_rate)) # drops 1 ms of samples after each retune/gain change while the LO settles
+time_trigger = pysdr.trigger(samples_in_time_plots, pre_trigger_samples, mode='edge', level=0.0, holdoff=int(gui_refresh_period * samp_rate)) # rising zero crossing of I, see trigger.py for the other modes. the GUI shows one capture per refresh anyway
+constellation = pysdr.constellation_histogram(constellation_bins, max_amplitude=1.0, decay=0.8) # decaying 2D histogram of I and Q
 
 ###############
 # DSP Routine #
 ###############
 
 # Function that processes each batch of samples that comes in (currently, all DSP goes here)
-def process_samples(samples):
-    startTime = time.time()
-    if accumulator.accumulate_samples(samples): # add samples to accumulator (returns True when we have enough)
+def process_samples(samples, tags):
+    shedder.begin()
+    num_samples = len(samples)
+    samples = settle_gate.gate(samples, tags) # removes settling samples right after a retune, instead of pausing the stream
+    time_trigger.process(samples) # searches every batch, not just the ones the display gets, so pre-trigger history is continuous
+    frame = None
+    if accumulator.accumulate_samples(samples) and shedder.should_process(): # add samples to accumulator (returns True when we have enough), and skip the display work if we are overloaded
         samples = accumulator.samples # messy way of doing it but it works
         #samples = prefilter.filter(samples) # uncomment this to add a filter
         PSD = 10.0 * np.log10(np.abs(np.fft.fftshift(np.fft.fft(samples, fft_size)/float(fft_size)))**2) # calcs PSD, crops input to size of fft
-        # add row to waterfall
-        waterfall = waterfall_plot._input_buffer['waterfall'][0] # pull waterfall from buffer
-        waterfall[:] = np.roll(waterfall, -1, axis=0) # shifts waterfall 1 row
-        waterfall[-1,:] = PSD # fill last row with new fft results
-        # stick everything we want to display into the shared buffer
-        waterfall_plot._input_buffer['waterfall'] = [waterfall] # remember to copy it back into the buffer
-        fft_plot._input_buffer['y'] = PSD # overwrites whatever was in psd buffer, so that the GUI uses the most recent one when it goes to refresh itself
-        time_plot._input_buffer['i'] = np.real(samples[0:samples_in_time_plots]) # i buffer
-        time_plot._input_buffer['q'] = np.imag(samples[0:samples_in_time_plots]) # q buffer
-        iq_plot._input_buffer['i'] = np.real(samples[0:samples_in_time_plots])
-        iq_plot._input_buffer['q'] = np.imag(samples[0:samples_in_time_plots])
-        utilization_plot._input_buffer['y'] = [(time.time() - startTime)/float(len(samples))*samp_rate] # should be below 1.0 to avoid overflows
+        # write everything we want to display straight into the next slot of the shared channel, the GUI uses the most recent one when it goes to refresh itself
+        frame = dsp_channel.begin_write()
+        frame['psd'][:] = PSD
+        capture = samples[0:samples_in_time_plots] if time_trigger.latest is None else time_trigger.latest # free running until the first trigger
+        frame['i'][:] = np.real(capture) # i buffer
+        frame['q'][:] = np.imag(capture) # q buffer
+        constellation.add(samples) # all of the samples, not just the first few hundred
+        constellation.to_uint8(out=frame['constellation'])
+    shedder.end(num_samples) # measured on every batch, processed or not, and a decision window closes here
+    if frame is not None:
+        frame['utilization'][0] = shedder.utilization # should be below 1.0 to avoid overflows, includes the block just processed
+        frame['display_fraction'][0] = shedder.fraction
+        dsp_channel.end_write()
         
 ###############
 # USRP Config #
@@ -156,7 +172,7 @@ def run_usrp():
     time.sleep(2.0)
     usrp.send_stream_command({'now': True}) # start streaming
     '''
-    usrp = pysdr.usrp_source('num_recv_frames=100') # this is where you would choose which addr or usrp type. see below for other options
+    usrp = pysdr.usrp_source('num_recv_frames=100', usrp_commands) # this is where you would choose which addr or usrp type. see below for other options
     # num_recv_frames   - sets the maximum number of frames that can be buffered, so increasing this will help avoid ERROR_CODE_OVERFLOW. by default it's like 16 or so
     # recv_frame_size   - the size of each recv frame in bytes. default is 8192 which translates to 2044 samples returned by recv() each time
     # master_clock_rate - forces master clock rate to a certain value.  keep in mind this must be an integer multiple of the sample rate
@@ -167,17 +183,14 @@ def run_usrp():
     usrp.set_center_freq(center_freq)
     usrp.set_gain(gain)
     usrp.prepare_to_rx()
-    while True: # endless loop of rx samples
-        if not usrp_command_queue.empty():  # check if there's a usrp command in the queue
-            command = usrp_command_queue.get()
-            eval('usrp.' + command) # messy way to do it!
+    while True: # endless loop of rx samples (any queued commands get applied inside recv())
         ''' pysdruhd version
         samples, metadata = usrp.recv() # receive samples. pretty sure this function is blocking
         process_samples(samples[0,:]) # send samples to DSP
         '''
         # pyuhd version
         samples = usrp.recv()
-        process_samples(samples) # send samples to DSP
+        process_samples(samples, usrp.tags) # send samples to DSP
         
 # We do run_usrp() and process_samples() in a 2nd thread, while the Bokeh GUI stuff is in the main thread
 usrp_dsp_process = Process(target=run_usrp) 
@@ -187,8 +200,13 @@ usrp_dsp_process.start()
 ################
 # Assemble App #
 ################
+if headless:
+    myapp = pysdr.pysdr_app(headless=True)
+    myapp.run_headless(dsp_channel, [pysdr.frame_file_sink('dsp_frames.frames')]) # blocking, ctrl-C to stop
+    sys.exit()
+widgets, plots, plot_update = build_gui()
 myapp = pysdr.pysdr_app() # start new pysdr app
-myapp.assemble_bokeh_doc(widgets, plots, plot_update, pysdr.black_and_white) # widgets, plots, periodic callback function, theme
+myapp.assemble_bokeh_doc(widgets, plots, plot_update, pysdr.black_and_white, adaptive=True, utilization=dsp_utilization) # widgets, plots, periodic callback function, theme. adaptive picks the refresh rate
 myapp.create_bokeh_server()
 myapp.create_web_server() 
 myapp.start_web_server() # start web server.  blocking
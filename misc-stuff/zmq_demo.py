@@ -15,13 +15,12 @@ from bokeh.application import Application
 from bokeh.application.handlers import FunctionHandler
 from bokeh.embed import autoload_server
 from bokeh.layouts import column, row, gridplot, Spacer, widgetbox
-from bokeh.models import Select, TextInput
+from bokeh.models import Select, TextInput, LinearColorMapper
 from bokeh.server.server import Server
 from bokeh.util.browser import view # utility to Open a browser to view the specified location.
 
 from multiprocessing import Process, Manager 
 
-import zmq
 
 # Right now the way this demo works is you run a gnuradio flowgraph with a USRP (or any SDR)
 #   connected directly to a ZMQ-PUB sink, and run it.  No actual USRP commands are send by this app yet.
@@ -38,7 +37,7 @@ samples_in_time_plots = 500  # should be less than samples per batch which is ar
 # Set up the shared buffer between threads (using multiprocessing's Manager).  it is global
 manager = Manager()
 shared_buffer = manager.dict() # there is also an option to use a list
-shared_buffer['waterfall'] = np.ones((waterfall_samples, fft_size))*-100.0 # waterfall buffer
+shared_buffer['waterfall'] = np.zeros((waterfall_samples, fft_size), dtype=np.uint8) # waterfall buffer, as colour indices (see pysdr.colormap)
 shared_buffer['psd'] = np.zeros(fft_size) # PSD buffer
 shared_buffer['i'] = np.zeros(samples_in_time_plots) # I buffer (time domain)
 shared_buffer['q'] = np.zeros(samples_in_time_plots) # Q buffer (time domain)
@@ -47,20 +46,15 @@ shared_buffer['utilization'] = 0.0 # float between 0 and 1, used to store how th
 # Function that processes each batch of samples that comes in (currently, all DSP goes here)
 def process_samples():
     # Set up connection to gnuradio or whatever is providing zmq stream of np.complex64 in array form
-    context = zmq.Context()
-    socket = context.socket(zmq.SUB)
-    print "Connecting to server"
-    socket.connect ("tcp://localhost:%s" % port)
-    topicfilter = "" # no idea why, but if i dont provide an empty topic filter then it just does not work, even the simple pyzmq example doesn't work
-    socket.setsockopt(zmq.SUBSCRIBE, topicfilter)
+    print("Connecting to server")
+    source = pysdr.zmq_source("tcp://localhost:%s" % port, raw=True) # raw because gnuradio's ZMQ PUB sink sends bare sample buffers
+    waterfall = pysdr.colormap.waterfall_renderer(fft_size, waterfall_samples, auto_levels=True) # keeps the waterfall history as uint8
     while True: # Run forever
-        samples = np.frombuffer(socket.recv(), dtype=np.complex64) # blocking until there's a msg sent by the server
+        samples = source.recv() # blocking until there's a msg sent by the server, no copy of the samples is made
         startTime = time.time()
         PSD = 10.0 * np.log10(np.abs(np.fft.fftshift(np.fft.fft(samples, fft_size)/float(fft_size)))**2) # calcs PSD
-        waterfall = shared_buffer['waterfall'] # pull waterfall from buffer
-        waterfall[:] = np.roll(waterfall, -1, axis=0) # shifts waterfall 1 row
-        waterfall[-1,:] = PSD # fill last row with new fft results
-        shared_buffer['waterfall'] = waterfall # you have to copy it back into the manager_list
+        waterfall.add_rows(PSD) # quantizes the new row once and adds it to the history, no np.roll of the whole thing
+        shared_buffer['waterfall'] = waterfall.image() # 8x smaller than float64 to send through the manager
         shared_buffer['psd'] = PSD # overwrites whatever was in psd buffer, so that the GUI uses the most recent one when it goes to refresh itself
         shared_buffer['i'] = np.real(samples[0:samples_in_time_plots]) # i buffer
         shared_buffer['q'] = np.imag(samples[0:samples_in_time_plots]) # q buffer
@@ -93,7 +87,7 @@ def main_doc(doc):
                                           y = 0, # start of y
                                           dw = fft_size, # size of x
                                           dh = waterfall_samples, # size of y
-                                          palette = "Spectral9") # closest thing to matlab's jet    
+                                          color_mapper = LinearColorMapper(palette=pysdr.colormap.palette('jet'), low=0, high=255)) # fixed mapping, no autorange of float values
 
     # IQ/Constellation Sink ("circle" plot)
     iq_plot = pysdr.base_plot(' ', ' ', 'IQ Plot')
@@ -116,15 +110,21 @@ def main_doc(doc):
     doc.add_root(gridplot([[fft_plot, time_plot], [waterfall_plot, iq_plot]], sizing_mode="scale_width", merge_tools=False)) # Spacer(width=20, sizing_mode="fixed")
    
     
+    # updaters only send what changed, as float32 binary arrays, instead of replacing whole columns every time
+    timeI_updater = pysdr.source_updater(timeI_line)
+    timeQ_updater = pysdr.source_updater(timeQ_line)
+    iq_updater = pysdr.source_updater(iq_data)
+    fft_updater = pysdr.source_updater(fft_line)
+    utilization_updater = pysdr.source_updater(utilization_data)
+
     # This function gets called periodically, and is how the "real-time streaming mode" works   
     def plot_update():  
-        timeI_line.data_source.data['y'] = shared_buffer['i'] # send most recent I to time sink
-        timeQ_line.data_source.data['y'] = shared_buffer['q'] # send most recent Q to time sink
-        iq_data.data_source.data['x'] = shared_buffer['i'] # send most recent I to IQ
-        iq_data.data_source.data['y'] = shared_buffer['q'] # send most recent Q to IQ
-        fft_line.data_source.data['y'] = shared_buffer['psd'] # send most recent psd to freq sink
+        timeI_updater.update(y=shared_buffer['i']) # send most recent I to time sink
+        timeQ_updater.update(y=shared_buffer['q']) # send most recent Q to time sink
+        iq_updater.update(x=shared_buffer['i'], y=shared_buffer['q']) # send most recent I and Q to IQ
+        fft_updater.update(y=shared_buffer['psd']) # send most recent psd to freq sink
         waterfall_data.data_source.data['image'] = [shared_buffer['waterfall']] # send waterfall 2d array to waterfall sink
-        utilization_data.data_source.data['top'] = [shared_buffer['utilization']] # send most recent utilization level (only need to adjust top of rectangle)
+        utilization_updater.update(top=[shared_buffer['utilization']]) # send most recent utilization level (only need to adjust top of rectangle)
 
     # Add a periodic callback to be run every x milliseconds
     doc.add_periodic_callback(plot_update, 150) 
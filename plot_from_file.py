@@ -5,14 +5,13 @@ from PyQt5 import QtCore, QtWidgets, QtGui
 from PyQt5.QtWidgets import QMainWindow, QLabel, QGridLayout, QWidget, QPushButton, QHBoxLayout
 from PyQt5.QtCore import QSize, pyqtSlot
 import pyqtgraph as pg
+import pysdr
 
 # Params
 filename = 'example_signal.iq'
 
 # Read in signal from file
-x = np.fromfile(filename, dtype=np.uint8)
-x = (x - 127.5)/256.0
-x = x[1::2] + 1j * x[::2] # un-interleave the I and Q
+x = pysdr.uint8_iq_to_complex(np.fromfile(filename, dtype=np.uint8), dtype=np.complex128) # un-interleaves the I and Q
 
 #filename = 'slice_417759-517759.iq'
 #x = np.fromfile(filename, dtype=np.complex128)
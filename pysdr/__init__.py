@@ -1,10 +1,65 @@
 # remember that relative imports are gone in python3, but the following will support 2 and 3
-from pysdr.gui import base_plot
-from pysdr.gui import utilization_bar
-from pysdr.themes import black_and_white
-from pysdr.filters import fir_filter
-from pysdr.filters import fft_filter
-from pysdr.decimate import decimate
-from pysdr.pyuhd_wrapper import usrp_source
-from pysdr.pysdr_app import pysdr_app
-from pysdr.accumulator import accumulator
+# Everything is loaded lazily (PEP 562), on first use of e.g. pysdr.fir_filter, so import pysdr is fast and a
+#   filter-only worker never pulls in UHD, Bokeh, Flask or Tornado.  Add new blocks to this table.
+import importlib
+
+_lazy = {'base_plot': 'pysdr.gui',
+         'utilization_bar': 'pysdr.gui',
+         'utilization_breakdown': 'pysdr.gui',
+         'source_updater': 'pysdr.gui',
+         'waterfall_sink': 'pysdr.gui',
+         'decimated_line': 'pysdr.gui',
+         'constellation_density_sink': 'pysdr.gui',
+         'triggered_time_sink': 'pysdr.gui',
+         'eye_diagram_sink': 'pysdr.gui',
+         'black_and_white': 'pysdr.themes',
+         'fir_filter': 'pysdr.filters',
+         'fft_filter': 'pysdr.filters',
+         'decimate': 'pysdr.decimate',
+         'usrp_source': 'pysdr.pyuhd_wrapper',
+         'sim_source': 'pysdr.sim_source',
+         'replay_source': 'pysdr.replay_source',
+         'uint8_iq_to_complex': 'pysdr.replay_source',
+         'pysdr_app': 'pysdr.pysdr_app',
+         'accumulator': 'pysdr.accumulator',
+         'ring_buffer': 'pysdr.ring_buffer',
+         'framer': 'pysdr.framer',
+         'psd': 'pysdr.spectrum',
+         'flowgraph': 'pysdr.flowgraph',
+         'process_executor': 'pysdr.executor',
+         'load_shedder': 'pysdr.load_shedding',
+         'refresh_controller': 'pysdr.refresh',
+         'profiling': None, # None means the name is a submodule
+         'tracing': None,
+         'colormap': None,
+         'constellation_histogram': 'pysdr.histograms',
+         'eye_histogram': 'pysdr.histograms',
+         'trigger': 'pysdr.trigger',
+         'qtgui': None,
+         'command_channel': 'pysdr.commands',
+         'settle_gate': 'pysdr.commands',
+         'zmq_source': 'pysdr.zmq_blocks',
+         'zmq_sink': 'pysdr.zmq_blocks',
+         'shared_channel': 'pysdr.shared_buffer',
+         'frame_file_sink': 'pysdr.frame_sinks',
+         'frame_zmq_sink': 'pysdr.frame_sinks',
+         'read_frame_file': 'pysdr.frame_sinks'}
+
+# modules that need UHD, Bokeh/Flask, pyqtgraph or pyzmq, reachable as pysdr.<name> but left out of "from pysdr import *"
+#   so that works on a machine without them
+_optional = ('pysdr.gui', 'pysdr.themes', 'pysdr.pyuhd_wrapper', 'pysdr.qtgui', 'pysdr.zmq_blocks')
+
+__all__ = sorted(name for name, module in _lazy.items() if (module or 'pysdr.' + name) not in _optional)
+
+
+def __getattr__(name):
+    if name not in _lazy:
+        raise AttributeError("module 'pysdr' has no attribute %r" % name)
+    module = importlib.import_module(_lazy[name] or 'pysdr.' + name)
+    value = module if _lazy[name] is None else getattr(module, name)
+    globals()[name] = value # so __getattr__ only runs once per name
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_lazy))
@@ -1,46 +1,67 @@
+from __future__ import print_function # allows python3 print() to work in python2
+
 import numpy as np
 
+from pysdr.ring_buffer import ring_buffer
+from pysdr.profiling import instrumented
+
 # simple accumulator, returns True when it reaches the minimum samples specified and auto clears buffer
-# assumes the min_samples is larger than the largest batch of samples recved by usrp
+# batches can be any size, even larger than min_samples.  if a batch completes more than one block then only
+#   the newest block is handed out (the older ones are counted in self.skipped), which is what a GUI wants
+# self.samples is a view into the ring buffer (no copy), it stays valid until the next call to accumulate_samples
+#   the ring holds at most 2*min_samples (the block handed out plus a partial one) on top of the batch being written,
+#   so it's sized for that once, from max_batch or from the first batch that doesn't fit, and never reallocated
+#   while the stream keeps the same batch size
 class accumulator:
-    def __init__(self, min_samples): 
+    def __init__(self, min_samples, dtype=np.complex64, max_batch=0):
         self.min_samples = min_samples
-        self.samples = np.zeros(min_samples, dtype=np.complex64) # stores the samples
-        self.i = 0 # keeps track of where we are in the buffer
-        self.last_batch = False # signals to the next accumulate to clear the buffer
-        
+        self.ring = ring_buffer(2 * min_samples + max_batch, min_samples, dtype)
+        self.samples = None # most recent block of min_samples
+        self.skipped = 0 # blocks that were dropped because a newer one was ready at the same time
+        self.reallocations = 0 # times the ring had to grow for a bigger batch
+
+    @instrumented
     def accumulate_samples(self, samples):
-        num_samples = samples.size
-        if self.last_batch:
-            self.last_batch = False
-            self.samples[:] = np.zeros(self.min_samples, dtype=np.complex64) # clear buffer (mainly for debug at this point, no real reason to do it)
-            self.samples[0:self.remainder.size] = self.remainder
-            self.i = self.remainder.size
-            self.samples[self.i:self.i+num_samples] = samples
-            self.i += num_samples
+        if len(samples) > self.ring.size - 2 * self.min_samples: # only a batch bigger than anything we've seen before
+            self._grow(len(samples))
+        self.ring.write(samples)
+        blocks = self.ring.available() // self.min_samples
+        if blocks == 0:
             return False
-        if self.i + num_samples <= self.min_samples: # if there is room for all the samples
-            self.samples[self.i:self.i+num_samples] = samples
-            self.i += num_samples
-            return False
-        else:  # if this batch will put us over
-            self.samples[self.i:] = samples[0:self.min_samples - self.i]
-            self.remainder = samples[self.min_samples - self.i:]
-            self.last_batch = True
-            return True
-            
+        self.ring.read(0) # releases the previous block
+        self.ring.consume((blocks - 1) * self.min_samples)
+        self.skipped += blocks - 1
+        self.samples = self.ring.read(self.min_samples)
+        return True
 
+    def _grow(self, batch_size):
+        old = self.ring
+        old.read(0) # release anything still handed out
+        leftover = old.peek(old.available()) if old.available() else np.zeros(0, dtype=old.buffer.dtype)
+        self.ring = ring_buffer(2 * self.min_samples + batch_size, self.min_samples, old.buffer.dtype)
+        self.ring.write(leftover)
+        self.reallocations += 1
 
 
 ##############
-# UNIT TESTS # 
+# UNIT TESTS #
 ##############
 if __name__ == '__main__': # (call this script directly to run tests)
     accumulator1 = accumulator(25)
     x = np.arange(10)
-    accumulator1.accumulate_samples(x)
-    accumulator1.accumulate_samples(x)
-    accumulator1.accumulate_samples(x)
-    print accumulator1.samples
-    accumulator1.accumulate_samples(x)
-    print accumulator1.samples
+    results = [accumulator1.accumulate_samples(x + 10*i) for i in range(3)] # 30 samples in, so the 3rd batch completes a block
+    print("accumulator test passed?", results == [False, False, True] and np.array_equal(accumulator1.samples, np.arange(25)))
+    accumulator1.accumulate_samples(np.arange(30, 60)) # 5 leftover + 30 new, completes the 2nd block
+    print("leftover test passed?", np.array_equal(accumulator1.samples, np.arange(25, 50)))
+
+    # batch larger than min_samples (the old accumulator broke on this)
+    accumulator2 = accumulator(100)
+    accumulator2.accumulate_samples(np.arange(50))
+    print("large batch test passed?", accumulator2.accumulate_samples(np.arange(50, 1050)) and np.array_equal(accumulator2.samples, np.arange(900, 1000)) and accumulator2.skipped == 9)
+
+    # steady stream, the ring gets sized once and then never reallocated
+    for min_samples, batch_size in ((1024, 2044), (25, 10), (100, 1000)):
+        accumulator3 = accumulator(min_samples)
+        for i in range(200):
+            accumulator3.accumulate_samples(np.arange(i * batch_size, (i + 1) * batch_size))
+        print("reallocation test passed?", accumulator3.reallocations <= 1 and np.array_equal(accumulator3.samples, np.arange(accumulator3.samples[0].real, accumulator3.samples[0].real + min_samples)))
@@ -0,0 +1,150 @@
+from __future__ import print_function # allows python3 print() to work in python2
+
+import argparse
+import json
+import platform
+import sys
+import time
+import numpy as np
+
+from pysdr.filters import fir_filter
+from pysdr.filters import fft_filter
+from pysdr.decimate import decimate
+from pysdr.accumulator import accumulator
+from pysdr.spectrum import psd
+from pysdr.replay_source import uint8_iq_to_complex
+
+# Benchmark suite, so "6x faster" and "up to 56M without dropped samples" become numbers we can track.  It sweeps the
+#   blocks over tap counts, batch sizes and dtypes, reports Msps and real-time headroom (Msps / sample rate, so
+#   anything under 1.0 can't keep up), writes JSON, and compares against a saved baseline to catch regressions.
+#       python -m pysdr.bench --samp-rate 10e6 --output bench.json
+#       python -m pysdr.bench --baseline bench.json          # exits with 1 if anything got slower than the threshold
+#   Each case gets a fresh block and the same batch over and over, so this measures the block itself (steady state),
+#   not the radio or the GUI
+
+default_batch_sizes = [256, 4096, 65536, 1048576]
+default_num_taps = [16, 64, 256]
+default_dtypes = ['complex64', 'complex128']
+
+
+# each case is (name, uses taps?, setup), where setup(num_taps, dtype, batch_size) returns (work function, input batch)
+def _filter_case(filter_type):
+    def setup(num_taps, dtype, batch_size):
+        return filter_type(np.random.rand(num_taps)).filter, _noise(batch_size, dtype)
+    return setup
+
+def _decimate_setup(num_taps, dtype, batch_size):
+    block = decimate(10)
+    return lambda x: np.ascontiguousarray(block.decimate(x)), _noise(batch_size, dtype) # decimate() returns a view, so time making the output real
+
+def _accumulator_setup(num_taps, dtype, batch_size):
+    return accumulator(4096, dtype).accumulate_samples, _noise(batch_size, dtype)
+
+def _psd_case(overlap):
+    def setup(num_taps, dtype, batch_size):
+        return psd(1024, overlap=overlap, dtype=dtype).psd, _noise(batch_size, dtype)
+    return setup
+
+def _uint8_iq_setup(num_taps, dtype, batch_size):
+    raw = np.random.randint(0, 256, 2 * batch_size).astype(np.uint8)
+    return lambda x: uint8_iq_to_complex(x, dtype), raw
+
+cases = [('fir_filter', True, _filter_case(fir_filter)),
+         ('fft_filter', True, _filter_case(fft_filter)),
+         ('decimate', False, _decimate_setup),
+         ('accumulator', False, _accumulator_setup),
+         ('psd', False, _psd_case(0.0)),
+         ('psd_overlap', False, _psd_case(0.5)),
+         ('uint8_iq', False, _uint8_iq_setup)]
+
+
+def _noise(batch_size, dtype):
+    return (np.random.randn(batch_size) + 1j*np.random.randn(batch_size)).astype(dtype)
+
+
+def _case_id(result):
+    taps = '/taps=%d' % result['num_taps'] if result['num_taps'] else ''
+    return '%s%s/%s/%d' % (result['block'], taps, result['dtype'], result['batch_size'])
+
+
+# runs work(x) until min_time has gone by (and at least min_calls times), returns Msps
+def measure(work, x, num_samples, min_time=0.2, min_calls=3):
+    work(x) # warm up, allocates whatever the block allocates on its first call
+    calls = 0
+    start = time.perf_counter()
+    elapsed = 0.0
+    while elapsed < min_time or calls < min_calls:
+        work(x)
+        calls += 1
+        elapsed = time.perf_counter() - start
+    return num_samples * calls / elapsed / 1e6
+
+
+def run(blocks=None, batch_sizes=default_batch_sizes, num_taps=default_num_taps, dtypes=default_dtypes, samp_rate=None, min_time=0.2, verbose=True):
+    results = []
+    for name, uses_taps, setup in cases:
+        if blocks and name not in blocks:
+            continue
+        for dtype in dtypes:
+            for taps in (num_taps if uses_taps else [0]):
+                for batch_size in batch_sizes:
+                    work, x = setup(taps, np.dtype(dtype), batch_size)
+                    msps = measure(work, x, batch_size, min_time)
+                    result = {'block': name, 'num_taps': taps, 'dtype': dtype, 'batch_size': batch_size, 'msps': msps,
+                              'headroom': msps * 1e6 / samp_rate if samp_rate else None}
+                    results.append(result)
+                    if verbose:
+                        print(format_result(result))
+    return results
+
+
+def format_result(result):
+    headroom = '%8.2fx' % result['headroom'] if result['headroom'] is not None else '        -'
+    return '%-45s %10.1f Msps %s' % (_case_id(result), result['msps'], headroom)
+
+
+# returns (case id, baseline Msps, new Msps) for every case that got slower by more than threshold (a fraction)
+def compare(results, baseline, threshold=0.1):
+    old = dict((_case_id(r), r['msps']) for r in baseline['results'])
+    regressions = []
+    for result in results:
+        case_id = _case_id(result)
+        if case_id in old and result['msps'] < old[case_id] * (1.0 - threshold):
+            regressions.append((case_id, old[case_id], result['msps']))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='pysdr benchmark suite, reports Msps per block')
+    parser.add_argument('--blocks', nargs='+', choices=[name for name, _, _ in cases], help='only run these blocks (default all)')
+    parser.add_argument('--batch-sizes', nargs='+', type=int, default=default_batch_sizes)
+    parser.add_argument('--taps', nargs='+', type=int, default=default_num_taps, help='tap counts for the filters')
+    parser.add_argument('--dtypes', nargs='+', choices=default_dtypes, default=default_dtypes)
+    parser.add_argument('--samp-rate', type=float, default=None, help='sample rate [Hz] to report real-time headroom against')
+    parser.add_argument('--min-time', type=float, default=0.2, help='seconds to spend on each case')
+    parser.add_argument('--output', help='write the results to this JSON file')
+    parser.add_argument('--baseline', help='JSON file from an earlier run to compare against')
+    parser.add_argument('--threshold', type=float, default=0.1, help='fraction slower than the baseline that counts as a regression')
+    args = parser.parse_args(argv)
+
+    results = run(args.blocks, args.batch_sizes, args.taps, args.dtypes, args.samp_rate, args.min_time)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'python': platform.python_version(),
+                       'numpy': np.__version__,
+                       'machine': platform.machine(),
+                       'processor': platform.processor(),
+                       'samp_rate': args.samp_rate,
+                       'results': results}, f, indent=1)
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        for case_id, old, new in regressions:
+            print('REGRESSION %-45s %10.1f -> %.1f Msps' % (case_id, old, new))
+        print('%d regressions' % len(regressions))
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,170 @@
+from __future__ import print_function # allows python3 print() to work in python2
+
+import functools
+import time
+from collections import deque
+
+from pysdr import tracing
+
+# One producer, many Bokeh sessions.  With a plot_update callback per document, every open browser re-reads the DSP
+#   output and redoes the same work.  Here snapshot() runs once per frame (read the shared_channel, quantize the
+#   waterfall rows, decimate traces, ...), and the finished snapshot is handed to every session's apply(snapshot),
+#   which just pushes it into that session's plots.
+#   Every session acknowledges each frame from the browser once it has been applied there, and a session that already
+#   has max_in_flight frames waiting for an ack skips frames until it catches up, so one slow client (or a slow
+#   link) doesn't back up the server or the other clients.  Acks can get lost (a browser tab that was asleep, a
+#   dropped websocket message), so a frame that hasn't been acked after ack_timeout seconds stops counting as in
+#   flight.  Because frames get skipped, a snapshot should describe the whole display (latest PSD, latest time
+#   trace, ...) rather than only what changed since the previous one.
+#       def snapshot():
+#           frame_id, frame = dsp_channel.read(copy=True)
+#           return frame # None means nothing new, and nothing gets sent
+#       def make_session(doc):
+#           ... build this session's widgets and plots, doc.add_root() them ...
+#           def apply(frame):
+#               fft_updater.update(y=frame['psd'])
+#           return apply
+#       myapp.assemble_broadcast_doc(make_session, snapshot, pysdr.black_and_white)
+
+
+# one browser's frames in flight and ack latency, also used on its own by pysdr_app's adaptive refresh
+class ack_session:
+    def __init__(self, doc, apply, ack_timeout=1.0):
+        self.doc = doc
+        self.apply = apply
+        self.ack_timeout = ack_timeout # [seconds] a frame that waited this long for an ack is given up on
+        self.outstanding = deque() # (frame_id, time) of frames sent but not acknowledged by the browser yet
+        self.sent = 0
+        self.dropped = 0
+        self.expired = 0 # frames whose ack never came
+        self.last_ack_time = None
+        self.ack_latency = 0.0 # [seconds] smoothed time from sending a frame to the browser acking it
+        self.ack_source = None
+
+    # frame_id has to be in outstanding already.  an apply() that returns False had nothing to show, so no ack is
+    #   expected and the frame stops counting as in flight
+    def send(self, frame_id, snapshot):
+        if self.apply(snapshot) is False:
+            self.outstanding = deque(sent for sent in self.outstanding if sent[0] != frame_id)
+            return False
+        self.sent += 1
+        if self.ack_source is not None:
+            self.ack_source.data = {'frame': [frame_id]} # after the plot updates, so the ack means they were applied
+        return True
+
+    # a tiny data source in the document, the browser copies the frame id it just received into its tags, which syncs back
+    def attach_ack(self):
+        from bokeh.models import ColumnDataSource, CustomJS
+        ack_source = ColumnDataSource(data={'frame': [0]}, tags=[0])
+        ack_source.js_on_change('data', CustomJS(args=dict(source=ack_source), code="source.tags = [source.data['frame'][0]];"))
+        ack_source.on_change('tags', lambda attr, old, new: self.acknowledge(new[0]))
+        self.doc.add_root(ack_source)
+        self.ack_source = ack_source
+
+    # forgets frames that have waited more than ack_timeout, otherwise one lost ack would stall this session for good
+    def expire(self):
+        now = time.perf_counter()
+        while self.outstanding and now - self.outstanding[0][1] > self.ack_timeout:
+            self.outstanding.popleft()
+            self.expired += 1
+
+    # [seconds] how far behind the browser is, counting a frame that still hasn't been acked
+    def latency(self):
+        self.expire()
+        if not self.outstanding:
+            return self.ack_latency
+        return max(self.ack_latency, time.perf_counter() - self.outstanding[0][1])
+
+    def acknowledge(self, frame_id):
+        now = time.perf_counter()
+        while self.outstanding and self.outstanding[0][0] <= frame_id:
+            sent_frame_id, sent_time = self.outstanding.popleft()
+            if sent_frame_id == frame_id:
+                self.ack_latency += 0.2 * (now - sent_time - self.ack_latency)
+        self.last_ack_time = now
+
+
+class broadcaster:
+    def __init__(self, snapshot, max_in_flight=2, ack_timeout=1.0):
+        self.snapshot = tracing.traced(snapshot)
+        self.max_in_flight = max_in_flight
+        self.ack_timeout = ack_timeout
+        self.sessions = []
+        self.frame_id = 0
+
+    # apply(snapshot) updates the plots of one document, it gets called on that document's own tick
+    def add_session(self, doc, apply):
+        session = ack_session(doc, apply, self.ack_timeout)
+        session.attach_ack()
+        self.sessions.append(session)
+        doc.on_session_destroyed(lambda session_context: self.sessions.remove(session))
+        return session
+
+    # produces one snapshot and fans it out, call this periodically from the server's IOLoop
+    def tick(self):
+        snapshot = self.snapshot()
+        if snapshot is None:
+            return False
+        self.frame_id += 1
+        for session in list(self.sessions):
+            session.expire()
+            if len(session.outstanding) >= self.max_in_flight:
+                session.dropped += 1 # this client is behind, it gets the next frame instead
+                continue
+            session.outstanding.append((self.frame_id, time.perf_counter())) # counts as in flight as soon as it's queued
+            session.doc.add_next_tick_callback(functools.partial(session.send, self.frame_id, snapshot))
+        return True
+
+    # [seconds] the quickest session's latency, the slow ones drop frames so they shouldn't slow everyone else down
+    def latency(self):
+        return min([session.latency() for session in self.sessions] or [None])
+
+    def metrics(self):
+        return [{'sent': s.sent, 'dropped': s.dropped, 'in_flight': len(s.outstanding), 'expired': s.expired, 'ack_latency': s.ack_latency} for s in self.sessions]
+
+
+##############
+# UNIT TESTS #
+##############
+if __name__ == '__main__': # (call this script directly to run tests)
+    # stand-in for a Bokeh document, runs next tick callbacks right away
+    class fake_doc:
+        def add_next_tick_callback(self, callback):
+            callback()
+
+    frames = iter(range(100))
+    calls = []
+    def snapshot():
+        calls.append(1)
+        return next(frames)
+    fast_frames, slow_frames = [], []
+    b = broadcaster(snapshot, max_in_flight=2)
+    fast = ack_session(fake_doc(), fast_frames.append)
+    slow = ack_session(fake_doc(), slow_frames.append)
+    b.sessions = [fast, slow] # skip add_session, it needs Bokeh for the ack
+    for i in range(10):
+        b.tick()
+        fast.acknowledge(b.frame_id) # fast client acks every frame, the slow one never does
+    print("broadcast test passed?", len(calls) == 10 and fast_frames == list(range(10)) and slow_frames == [0, 1] and slow.dropped == 8)
+    slow.acknowledge(2)
+    b.tick()
+    print("catch up test passed?", slow_frames == [0, 1, 10] and len(slow.outstanding) == 1)
+
+    # an ack that never arrives only holds a session back for ack_timeout
+    lost_frames = []
+    lost = ack_session(fake_doc(), lost_frames.append, ack_timeout=0.05)
+    b.sessions = [lost]
+    for i in range(3):
+        b.tick()
+    time.sleep(0.1)
+    print("stalled test passed?", len(lost_frames) == 2 and lost.dropped == 1 and lost.latency() < 0.05)
+    b.tick()
+    print("ack timeout test passed?", len(lost_frames) == 3 and lost.expired == 2 and len(lost.outstanding) == 1)
+
+    # how pysdr_app's adaptive refresh uses a session: plot_update returning False means nothing was sent
+    updates = iter([True, False])
+    session = ack_session(fake_doc(), lambda snapshot: next(updates))
+    session.outstanding.append((1, time.perf_counter()))
+    sent = session.send(1, None)
+    session.outstanding.append((2, time.perf_counter()))
+    print("nothing new test passed?", sent and not session.send(2, None) and [f[0] for f in session.outstanding] == [1] and session.sent == 1)
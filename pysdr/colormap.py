@@ -0,0 +1,126 @@
+from __future__ import print_function # allows python3 print() to work in python2
+
+import numpy as np
+
+# Colour maps for waterfalls.  Rather than sending/drawing float dB values and mapping them to colours on every
+#   refresh, a waterfall row gets quantized once to a uint8 index (0 = floor, 255 = ceiling) and from then on it's
+#   only ever an index into a 256 entry lookup table, whether that's a Bokeh palette or a pyqtgraph LUT.
+
+# anchor points (position from 0 to 1, r, g, b), interpolated to however many entries are needed
+_anchors = {'jet': [(0.0, 0.0, 0.0, 0.5), (0.125, 0.0, 0.0, 1.0), (0.375, 0.0, 1.0, 1.0), (0.625, 1.0, 1.0, 0.0), (0.875, 1.0, 0.0, 0.0), (1.0, 0.5, 0.0, 0.0)],
+            'gray': [(0.0, 0.0, 0.0, 0.0), (1.0, 1.0, 1.0, 1.0)],
+            'viridis': [(0.0, 0.267, 0.005, 0.329), (0.25, 0.229, 0.322, 0.546), (0.5, 0.128, 0.567, 0.551), (0.75, 0.369, 0.789, 0.383), (1.0, 0.993, 0.906, 0.144)]}
+
+
+# (n x 3) uint8 RGB table, e.g. for pyqtgraph's ImageItem.setLookupTable()
+def lut(name='jet', n=256):
+    anchors = np.array(_anchors[name])
+    x = np.linspace(0.0, 1.0, n)
+    return np.round(255 * np.stack([np.interp(x, anchors[:, 0], anchors[:, i]) for i in (1, 2, 3)], axis=1)).astype(np.uint8)
+
+
+# list of n '#rrggbb' strings, e.g. for a Bokeh LinearColorMapper
+def palette(name='jet', n=256):
+    return ['#%02x%02x%02x' % tuple(rgb) for rgb in lut(name, n)]
+
+
+# maps dB values to uint8 colour indices, floor and below -> 0, ceiling and above -> 255
+def quantize(db, floor, ceiling, out=None):
+    scaled = (np.asarray(db, dtype=np.float32) - floor) * (255.0 / (ceiling - floor))
+    if out is None:
+        out = np.empty(scaled.shape, dtype=np.uint8)
+    np.clip(scaled, 0, 255, out=scaled)
+    np.rint(scaled, out=scaled)
+    out[...] = scaled
+    return out
+
+
+# Waterfall history kept as uint8 colour indices instead of float dB (8x less memory than float64, and what gets
+#   blitted is already in the form the display wants).  Every row is mapped through floor/ceiling exactly once, when
+#   it arrives, and with auto_levels the floor and ceiling follow a running percentile of the incoming rows (smoothed,
+#   so they don't pump).  Rows that are already in the history keep the levels they were quantized with.
+#   quantize() and push() can be split across threads (e.g. quantize on the DSP thread, push on the GUI thread),
+#   add_rows() does both.  image() is the newest num_rows rows, oldest first, as a view (no copy), and rgba() goes
+#   through the precomputed LUT for frontends that want colours rather than indices.
+class waterfall_renderer:
+    def __init__(self, fft_size, num_rows, floor=-100.0, ceiling=0.0, palette='jet', auto_levels=False, percentiles=(5.0, 99.9), smoothing=0.1):
+        self.fft_size = fft_size
+        self.num_rows = num_rows
+        self.floor = floor
+        self.ceiling = ceiling
+        self.palette = palette
+        self.auto_levels = auto_levels
+        self.percentiles = percentiles # (floor, ceiling) percentiles of each row, when auto_levels is on
+        self.smoothing = smoothing # how far the levels move towards each new row's percentiles
+        self.levels_set = False
+        self.lut = lut(palette)
+        rgba = np.empty((256, 4), dtype=np.uint8)
+        rgba[:, :3] = self.lut
+        rgba[:, 3] = 255
+        self.rgba_lut = rgba.view(np.uint32).ravel() # one 32 bit lookup per pixel instead of four 8 bit ones
+        self.history = None # allocated on the first push(), a frontend that keeps its own history never needs it
+        self.newest = num_rows - 1
+        self.rows_added = 0
+
+    # dB rows (one row or a 2D array, oldest first) -> uint8 colour indices
+    def quantize(self, rows):
+        rows = np.atleast_2d(rows)
+        if self.auto_levels and len(rows):
+            low, high = np.percentile(rows[-1], self.percentiles)
+            smoothing = self.smoothing if self.levels_set else 1.0 # start from the first row's levels, not the defaults
+            self.levels_set = True
+            self.floor += smoothing * (low - self.floor)
+            self.ceiling += smoothing * (high - self.ceiling)
+            self.ceiling = max(self.ceiling, self.floor + 1.0) # at least 1 dB of range, a flat spectrum would divide by 0
+        return quantize(rows, self.floor, self.ceiling)
+
+    # adds rows that were already quantized
+    def push(self, rows):
+        if self.history is None:
+            # every row is written twice, num_rows apart, so the newest num_rows rows are always one contiguous view
+            self.history = np.zeros((2 * self.num_rows, self.fft_size), dtype=np.uint8)
+        rows = np.atleast_2d(rows)[-self.num_rows:] # anything older would scroll straight off anyway
+        if len(rows) == 0:
+            return
+        indices = (self.newest + 1 + np.arange(len(rows))) % self.num_rows
+        self.history[indices] = rows
+        self.history[indices + self.num_rows] = rows
+        self.newest = int(indices[-1])
+        self.rows_added += len(rows)
+
+    def add_rows(self, rows):
+        quantized = self.quantize(rows)
+        self.push(quantized)
+        return quantized
+
+    # (num_rows x fft_size) uint8 view, oldest row first
+    def image(self):
+        if self.history is None:
+            self.push(np.zeros((0, self.fft_size), dtype=np.uint8))
+        return self.history[self.newest + 1:self.newest + 1 + self.num_rows]
+
+    # (num_rows x fft_size x 4) uint8 RGBA, oldest row first
+    def rgba(self, out=None):
+        if out is None:
+            out = np.empty((self.num_rows, self.fft_size, 4), dtype=np.uint8)
+        np.take(self.rgba_lut, self.image(), out=out.view(np.uint32).reshape(self.num_rows, self.fft_size))
+        return out
+
+
+##############
+# UNIT TESTS #
+##############
+if __name__ == '__main__': # (call this script directly to run tests)
+    q = quantize(np.array([-120.0, -100.0, -50.0, 0.0, 10.0]), -100.0, 0.0)
+    print("quantize test passed?", list(q) == [0, 0, 128, 255, 255])
+    table = lut('jet')
+    print("lut test passed?", table.shape == (256, 3) and list(table[0]) == [0, 0, 128] and palette('gray')[-1] == '#ffffff')
+    renderer = waterfall_renderer(8, 4, floor=-100.0, ceiling=0.0, palette='gray')
+    for i in range(6):
+        renderer.add_rows(np.full(8, -100.0 + 20.0 * i)) # row i quantizes to 51*i
+    print("waterfall history test passed?", [int(row[0]) for row in renderer.image()] == [102, 153, 204, 255] and renderer.image().base is renderer.history)
+    rgba = renderer.rgba()
+    print("waterfall rgba test passed?", rgba.shape == (4, 8, 4) and list(rgba[0, 0]) == [102, 102, 102, 255] and list(rgba[3, 7]) == [255, 255, 255, 255])
+    renderer = waterfall_renderer(1024, 10, auto_levels=True)
+    row = renderer.add_rows(np.random.randn(1024) * 2.0 - 60.0) # noise floor around -60 dB, nowhere near the default -100 to 0
+    print("auto levels test passed?", -70 < renderer.floor < -60 and -60 < renderer.ceiling < -50 and row[0].min() == 0 and row[0].max() == 255)
@@ -0,0 +1,76 @@
+from __future__ import print_function # allows python3 print() to work in python2
+
+import numpy as np
+from multiprocessing import Queue
+try:
+    from queue import Empty # python3
+except ImportError:
+    from Queue import Empty # python2
+
+# Thread (and process) safe way of sending tune/gain requests to a source while it keeps streaming.
+#   The GUI side calls set_center_freq()/set_gain() on the channel, and the source applies whatever is
+#   waiting in between packets, so there's no need to stop the stream, sleep, and restart it.
+#   It uses a multiprocessing Queue so it works whether the source lives in a Thread or a Process
+#   (just create it before starting the Process so both sides share it)
+class command_channel:
+    def __init__(self):
+        self.queue = Queue()
+
+    # delay is in seconds relative to the radio's current time, sources that support timed commands
+    #   (e.g. UHD) will schedule the change instead of applying it immediately
+    def set_center_freq(self, center_freq, delay=None):
+        self.queue.put(('center_freq', float(center_freq), delay))
+
+    def set_gain(self, gain, delay=None):
+        self.queue.put(('gain', float(gain), delay))
+
+    # called by the source between packets, returns a list of (key, value, delay) and never blocks
+    def get_pending(self):
+        commands = []
+        while True:
+            try:
+                commands.append(self.queue.get_nowait())
+            except Empty:
+                return commands
+
+
+# Sources put a tag on the first sample that was received after a command took effect, in the form
+#   (sample_index, key, value) where sample_index is relative to the batch returned by recv().
+#   This gate uses those tags to throw away the samples taken while the LO/AGC was settling, so that
+#   PSD averaging and the waterfall don't get smeared, without having to pause the whole stream
+class settle_gate:
+    def __init__(self, settling_samples):
+        self.settling_samples = settling_samples
+        self.to_discard = 0 # keeps track of how many samples still need to be dropped at the beginning of the next batch
+
+    # returns the portion of the batch that is safe to use (possibly empty)
+    def gate(self, samples, tags):
+        start = 0
+        for tag in tags:
+            if tag[0] >= start: # a new tag restarts the settling period
+                start = tag[0]
+                self.to_discard = self.settling_samples
+        if self.to_discard == 0:
+            return samples[start:] if start else samples
+        skip = min(self.to_discard, len(samples) - start)
+        self.to_discard -= skip
+        return samples[start + skip:]
+
+
+##############
+# UNIT TESTS #
+##############
+if __name__ == '__main__': # (call this script directly to run tests)
+    channel = command_channel()
+    channel.set_center_freq(101.1e6)
+    channel.set_gain(40, delay=0.1)
+    import time
+    time.sleep(0.1) # let the queue's feeder thread flush
+    print("command_channel test passed?", channel.get_pending() == [('center_freq', 101.1e6, None), ('gain', 40.0, 0.1)])
+
+    gate = settle_gate(150)
+    x = np.arange(300)
+    out1 = gate.gate(x, []) # no tags, everything passes
+    out2 = gate.gate(x, [(200, 'center_freq', 100e6)]) # only 100 samples after the tag, all of them settling
+    out3 = gate.gate(x, []) # remaining 50 settling samples get dropped
+    print("settle_gate test passed?", len(out1) == 300 and len(out2) == 0 and np.array_equal(out3, x[50:]))
@@ -0,0 +1,50 @@
+from __future__ import print_function # allows python3 print() to work in python2
+
+import numpy as np
+
+# Reduces a trace to about one point per pixel column before it gets sent to the browser, so a 16384 point FFT or a
+#   long time trace costs O(pixels) to transport and draw instead of O(samples), and narrow peaks don't disappear
+#   the way they would with plain decimation (x[::n]).
+#   mode='minmax' keeps the min and max of each pixel column (2 points per column), for time traces
+#   mode='max' keeps the max of each pixel column, for spectra (max-pooling adjacent bins)
+#   x has to be increasing.  x_start/x_end are the visible range, so zooming in brings back the full detail
+
+
+def decimate_for_display(x, y, num_pixels, x_start=None, x_end=None, mode='minmax'):
+    first = 0 if x_start is None else max(0, np.searchsorted(x, x_start) - 1) # one extra point on each side so the line reaches the edge
+    last = len(x) if x_end is None else min(len(x), np.searchsorted(x, x_end, side='right') + 1)
+    x = x[first:last]
+    y = y[first:last]
+    points_per_column = 2 if mode == 'minmax' else 1
+    if len(x) <= points_per_column * num_pixels:
+        return x, y # already at or below the pixel resolution
+    edges = np.linspace(0, len(x), num_pixels + 1).astype(np.int64)[:-1] # start of each pixel column
+    if mode == 'max':
+        centers = edges + (np.diff(np.append(edges, len(x))) // 2)
+        return x[centers], np.maximum.reduceat(y, edges)
+    if mode != 'minmax':
+        raise ValueError("mode has to be 'minmax' or 'max'")
+    # interleaved min, max, min, max, ... with both points of a column at its x, so the line draws a vertical stroke
+    #   from min to max in each column and then drops to the next column's min.  That zig-zag is what fills in the
+    #   envelope of the signal
+    mins = np.minimum.reduceat(y, edges)
+    maxs = np.maximum.reduceat(y, edges)
+    y_out = np.empty(2 * num_pixels, dtype=y.dtype)
+    y_out[0::2] = mins
+    y_out[1::2] = maxs
+    return np.repeat(x[edges], 2), y_out
+
+
+##############
+# UNIT TESTS #
+##############
+if __name__ == '__main__': # (call this script directly to run tests)
+    x = np.arange(16384, dtype=np.float64)
+    y = np.random.randn(16384) * 0.01
+    y[12345] = 10.0 # narrow peak that x[::32] would miss
+    xs, ys = decimate_for_display(x, y, 512, mode='max')
+    print("max test passed?", len(ys) == 512 and np.max(ys) == 10.0 and np.all(np.diff(xs) > 0))
+    xs, ys = decimate_for_display(x, y, 512, mode='minmax')
+    print("minmax test passed?", len(ys) == 1024 and np.max(ys) == 10.0 and np.min(ys) == np.min(y))
+    xs, ys = decimate_for_display(x, y, 512, x_start=12000, x_end=12500, mode='minmax')
+    print("zoom test passed?", len(ys) == 503 and xs[0] <= 12000 and xs[-1] >= 12500) # zoomed in far enough to send full detail
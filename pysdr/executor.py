@@ -0,0 +1,182 @@
+from __future__ import print_function # allows python3 print() to work in python2
+
+import numpy as np
+import os
+from multiprocessing import Process, Queue, shared_memory
+try:
+    from queue import Empty # python3
+except ImportError:
+    from Queue import Empty # python2
+
+from pysdr.shared_buffer import _attach
+from pysdr.profiling import instrumented
+
+# Runs one DSP stage in a pool of worker processes, for stages that stay GIL-bound even with threads
+#   (python-level demod loops, symbol slicing, lots of small FFTs...).  Batches go to the workers through shared
+#   memory, only a (sequence number, slot, length) tuple gets pickled, and outputs are put back in order.
+#
+# function has to be a plain function of one batch (it runs in another process, so it can't keep state between
+#   calls).  Stateful blocks like FIR filters still work by partitioning with overlap: each batch is handed to the
+#   worker with the last `overlap` input samples of the stream in front of it, e.g. for a FIR filter
+#       executor = pysdr.process_executor(functools.partial(np.convolve, v=taps, mode='valid'), overlap=len(taps)-1)
+#   gives the same output as pysdr.fir_filter(taps).  With the 'spawn' start method the function has to be picklable.
+#
+# submit()/work() are pipelined, they return whatever outputs are ready (in order) and don't wait for the batch
+#   just submitted, use flush() to wait for everything.  If a worker process dies (segfault, OOM kill) the batches it
+#   had are lost, so a wait for results raises RuntimeError instead of hanging forever
+
+class process_executor:
+    def __init__(self, function, num_workers=None, overlap=0, max_batch=65536, dtype=np.complex64, out_dtype=None, max_out=None, num_slots=None, poll_interval=0.5):
+        self.num_workers = num_workers if num_workers is not None else max(1, (os.cpu_count() or 2) - 1)
+        self.num_slots = num_slots if num_slots is not None else 2 * self.num_workers # enough to keep every worker busy while we fill the next one
+        self.overlap = overlap
+        self.max_batch = max_batch
+        self.dtype = np.dtype(dtype)
+        self.out_dtype = np.dtype(out_dtype if out_dtype is not None else dtype)
+        self.max_out = max_out if max_out is not None else max_batch
+        in_shape = (self.num_slots, overlap + max_batch)
+        out_shape = (self.num_slots, self.max_out)
+        self.in_shm = shared_memory.SharedMemory(create=True, size=int(np.prod(in_shape)) * self.dtype.itemsize)
+        self.out_shm = shared_memory.SharedMemory(create=True, size=int(np.prod(out_shape)) * self.out_dtype.itemsize)
+        self.in_pool = np.ndarray(in_shape, dtype=self.dtype, buffer=self.in_shm.buf)
+        self.out_pool = np.ndarray(out_shape, dtype=self.out_dtype, buffer=self.out_shm.buf)
+        self.history = np.zeros(overlap, dtype=self.dtype) # end of the previous batch, same initial state as fir_filter
+        self.free_slots = list(range(self.num_slots))
+        self.next_seq = 0 # sequence number of the next batch submitted
+        self.next_out = 0 # sequence number of the next output to hand back
+        self.finished = {} # seq -> (slot, length) that came back out of order
+        self.poll_interval = poll_interval # [seconds] how often a blocking wait checks that the workers are still alive
+        self.tasks = Queue()
+        self.results = Queue()
+        self.workers = [Process(target=_worker, args=(function, self.in_shm.name, in_shape, self.dtype.str, self.out_shm.name, out_shape, self.out_dtype.str, self.tasks, self.results)) for i in range(self.num_workers)]
+        for worker in self.workers:
+            worker.daemon = True
+            worker.start()
+
+    # hands the samples to the workers and returns the outputs that are ready so far, as a list of arrays in order
+    def submit(self, samples):
+        outputs = []
+        for start in range(0, len(samples), self.max_batch):
+            chunk = samples[start:start+self.max_batch]
+            while not self.free_slots: # all slots busy, wait for a worker to finish one
+                self._collect(outputs, block=True)
+            slot = self.free_slots.pop()
+            n = len(chunk)
+            self.in_pool[slot, :self.overlap] = self.history
+            self.in_pool[slot, self.overlap:self.overlap+n] = chunk
+            if self.overlap:
+                self.history = self.in_pool[slot, n:n+self.overlap].copy()
+            self.tasks.put((self.next_seq, slot, self.overlap + n))
+            self.next_seq += 1
+        self._collect(outputs, block=False)
+        return outputs
+
+    # flowgraph-friendly version of submit(), returns one array (or None if nothing is ready yet)
+    @instrumented
+    def work(self, samples):
+        outputs = self.submit(samples)
+        return np.concatenate(outputs) if outputs else None
+
+    # waits for every batch submitted so far and returns their outputs
+    def flush(self):
+        outputs = []
+        while self.next_out < self.next_seq:
+            self._collect(outputs, block=True)
+        return outputs
+
+    def close(self):
+        for worker in self.workers:
+            self.tasks.put(None)
+        for worker in self.workers:
+            worker.join()
+        self.in_pool = self.out_pool = None
+        for shm in (self.in_shm, self.out_shm):
+            shm.close()
+            shm.unlink()
+
+    # pulls results off the queue, and appends to outputs everything that is now in order
+    def _collect(self, outputs, block):
+        while True:
+            try:
+                seq, slot, length, error = self.results.get(block=block, timeout=self.poll_interval if block else None)
+            except Empty:
+                if not block:
+                    break
+                dead = [worker for worker in self.workers if not worker.is_alive()]
+                if dead:
+                    raise RuntimeError("process_executor worker died (exit code %s)" % dead[0].exitcode)
+                continue
+            if error is not None:
+                raise RuntimeError("process_executor worker failed: " + error)
+            self.finished[seq] = (slot, length)
+            block = False # only wait for the first one
+        while self.next_out in self.finished:
+            slot, length = self.finished.pop(self.next_out)
+            outputs.append(self.out_pool[slot, :length].copy()) # copy out so the slot can be reused right away
+            self.free_slots.append(slot)
+            self.next_out += 1
+
+
+def _worker(function, in_name, in_shape, dtype, out_name, out_shape, out_dtype, tasks, results):
+    in_shm = _attach(in_name)
+    out_shm = _attach(out_name)
+    in_pool = np.ndarray(in_shape, dtype=dtype, buffer=in_shm.buf)
+    out_pool = np.ndarray(out_shape, dtype=out_dtype, buffer=out_shm.buf)
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        seq, slot, n = task
+        try:
+            y = np.asarray(function(in_pool[slot, :n]))
+            if len(y) > out_shape[1]:
+                raise ValueError("output of %d samples doesn't fit in max_out=%d" % (len(y), out_shape[1]))
+            out_pool[slot, :len(y)] = y
+            results.put((seq, slot, len(y), None))
+        except Exception as e:
+            results.put((seq, slot, 0, repr(e)))
+    in_pool = out_pool = None
+    in_shm.close()
+    out_shm.close()
+
+
+##############
+# UNIT TESTS #
+##############
+if __name__ == '__main__': # (call this script directly to run tests)
+    import functools
+    from pysdr.filters import fir_filter
+
+    x = (np.random.randn(200000) + 1j*np.random.randn(200000)).astype(np.complex64) # signal
+    taps = np.random.rand(30).astype(np.float32)
+
+    # FIR filter split across worker processes using overlap, compared against the normal streaming fir_filter
+    executor = process_executor(functools.partial(np.convolve, v=taps, mode='valid'), num_workers=3, overlap=len(taps)-1, max_batch=5000)
+    y = []
+    batch_size = 3000 # represents how many samples come in at the same time
+    for i in range(len(x)//batch_size + 1):
+        y += executor.submit(x[i*batch_size:(i+1)*batch_size])
+    y += executor.flush()
+    executor.close()
+    y2 = fir_filter(taps).filter(x)
+    print("process_executor fir test passed?", np.allclose(np.concatenate(y), y2, rtol=1e-4, atol=1e-4))
+
+    # output with a different size and type than the input (e.g. a symbol slicer)
+    executor = process_executor(functools.partial(np.greater, 0), num_workers=2, dtype=np.float32, out_dtype=np.bool_)
+    z = np.random.randn(10000).astype(np.float32)
+    out = executor.submit(z) + executor.flush()
+    executor.close()
+    print("process_executor dtype test passed?", np.array_equal(np.concatenate(out), 0 > z))
+
+    # a worker that gets killed (OOM killer, segfault) must not hang the caller
+    executor = process_executor(np.negative, num_workers=1, dtype=np.float32, poll_interval=0.1)
+    executor.workers[0].kill()
+    executor.workers[0].join()
+    executor.submit(z)
+    try:
+        executor.flush()
+        died = False
+    except RuntimeError:
+        died = True
+    executor.close()
+    print("dead worker test passed?", died)
@@ -8,15 +8,19 @@ import numpy as np
 import time
 from scipy import signal
 
+from pysdr.profiling import instrumented
+
 # a np.convolve based filter, similar to signal.lfilter() but 6x faster even though it's still python
 class fir_filter:
     def __init__(self, taps):
         self.taps = taps
         self.previous_batch = np.zeros(len(self.taps) - 1, dtype=np.complex128) # holds end of previous batch, this is the "state" essentially
 
+    @instrumented
     def filter(self, x):
-        out = np.convolve(np.concatenate((self.previous_batch, x)), self.taps, mode='valid')
-        self.previous_batch = x[-(len(self.taps) - 1):] # the last portion of the batch gets saved for the next iteration #FIXME if batches become smaller than taps this won't work
+        x = np.concatenate((self.previous_batch, x))
+        out = np.convolve(x, self.taps, mode='valid')
+        self.previous_batch = x[len(x) - (len(self.taps) - 1):].copy() # the last portion gets saved for the next iteration, copied so we dont hold onto the caller's buffer (which might get reused)
         return out
 
 # an fft based filter (currently sux)
@@ -24,9 +28,11 @@ class fft_filter:
     def __init__(self, taps):
         self.taps = taps
         self.previous_batch = np.zeros(len(self.taps) - 1, dtype=np.complex128) # holds end of previous batch, this is the "state" essentially
+    @instrumented
     def filter(self, x):
-        out = signal.fftconvolve(np.concatenate((self.previous_batch, x)), self.taps, mode='valid')
-        self.previous_batch = x[-(len(self.taps) - 1):] # the last portion of the batch gets saved for the next iteration #FIXME if batches become smaller than taps this won't work
+        x = np.concatenate((self.previous_batch, x))
+        out = signal.fftconvolve(x, self.taps, mode='valid')
+        self.previous_batch = x[len(x) - (len(self.taps) - 1):].copy() # see fir_filter
         return out
 
 
@@ -48,7 +54,7 @@ if __name__ == '__main__': # (call this script directly to run tests)
     test_filter = fir_filter(taps) # initialize filters
     test_filter2 = fft_filter(taps)
     zi = np.zeros(len(taps) - 1) # used for lfilter
-    for i in range(len(x)/batch_size):
+    for i in range(len(x)//batch_size):
         x_input = x[i*batch_size:(i+1)*batch_size] # this line represents the incoming stream
         filter_output = test_filter.filter(x_input) # run the filter
         y2 = np.concatenate((y2, filter_output)) # add output to our log
@@ -0,0 +1,227 @@
+from __future__ import print_function # allows python3 print() to work in python2
+
+import numpy as np
+import threading
+import functools
+import inspect
+import time
+
+from pysdr import tracing
+
+# Minimal flowgraph: connect a source, any number of blocks, and a sink, and each one runs on its own thread
+#   with a bounded queue in between, so a slow stage no longer stalls the radio.  NumPy releases the GIL inside
+#   FFTs and convolutions, so the stages really do overlap on multiple cores.
+#   e.g.
+#       fg = pysdr.flowgraph()
+#       fg.connect(usrp, pysdr.fir_filter(taps), pysdr.decimate(10), pysdr.psd(512), my_sink_function)
+#       fg.start()
+#       ...
+#       fg.stop() # clean shutdown, the source gets stopped after everything downstream has drained
+#
+# - the source is anything with recv() (usrp_source, zmq_source, ...), a None from recv() just means nothing arrived yet
+# - blocks are the usual pysdr blocks (fir_filter, decimate, psd, ...) or any function that takes a batch and returns one,
+#   a block that returns None (or an empty array) doesn't send anything downstream that time
+# - the sink is just the last block, its return value is ignored
+# - blocks must not hold onto their input after returning (return a view of it is fine)
+# - the queue right after the source never blocks, if it's full the batch is dropped and counted, like a radio overflow.
+#   all the other queues block, which is how backpressure makes its way back to the source
+# - each batch gets an id as it leaves the source, so with pysdr.tracing enabled you can follow one batch through every stage
+
+_work_methods = ['work', 'filter', 'decimate', 'psd', 'send', 'write'] # how to call the pysdr blocks
+
+_done = object() # sentinel that flows down the graph on shutdown
+
+
+def _work_function(block):
+    for method in _work_methods:
+        if hasattr(block, method):
+            return getattr(block, method)
+    if callable(block):
+        return block
+    raise TypeError("don't know how to run block %r, it needs a work() method or to be callable" % (block,))
+
+
+def _block_name(block):
+    return getattr(block, '__name__', type(block).__name__)
+
+
+# bounded queue between two blocks, its slots are allocated once up front
+class _edge:
+    def __init__(self, name, capacity, drop_when_full):
+        self.name = name
+        self.slots = [None] * capacity
+        self.capacity = capacity
+        self.head = 0 # next slot to read
+        self.count = 0
+        self.drop_when_full = drop_when_full
+        self.lock = threading.Lock()
+        self.not_empty = threading.Condition(self.lock)
+        self.not_full = threading.Condition(self.lock)
+        # metrics
+        self.max_depth = 0
+        self.items = 0
+        self.drops = 0
+
+    def put(self, item, force=False):
+        with self.not_full:
+            if self.count == self.capacity:
+                if self.drop_when_full and not force:
+                    self.drops += 1
+                    return False
+                while self.count == self.capacity:
+                    self.not_full.wait()
+            self.slots[(self.head + self.count) % self.capacity] = item
+            self.count += 1
+            self.items += item is not _done # items are (batch id, samples) pairs, apart from the sentinel
+            self.max_depth = max(self.max_depth, self.count)
+            self.not_empty.notify()
+            return True
+
+    def get(self):
+        with self.not_empty:
+            while self.count == 0:
+                self.not_empty.wait()
+            item = self.slots[self.head]
+            self.slots[self.head] = None # dont keep the array alive
+            self.head = (self.head + 1) % self.capacity
+            self.count -= 1
+            self.not_full.notify()
+            return item
+
+    def metrics(self):
+        return {'name': self.name, 'depth': self.count, 'max_depth': self.max_depth, 'capacity': self.capacity, 'items': self.items, 'drops': self.drops}
+
+
+class flowgraph:
+    def __init__(self, queue_depth=8):
+        self.queue_depth = queue_depth
+        self.blocks = []
+        self.edges = []
+        self.threads = []
+        self.errors = [] # (block name, exception) for anything that blew up in a worker thread
+        self.stop_event = threading.Event()
+
+    def connect(self, source, *blocks):
+        if not hasattr(source, 'recv'):
+            raise TypeError("the first block has to be a source with a recv() method")
+        if not blocks:
+            raise ValueError("need at least one block after the source")
+        self.blocks = [source] + list(blocks)
+        names = [_block_name(b) for b in self.blocks]
+        self.edges = [_edge(names[i] + '->' + names[i+1], self.queue_depth, drop_when_full=(i == 0)) for i in range(len(blocks))]
+
+    def start(self):
+        self.stop_event.clear()
+        self.threads = [threading.Thread(target=self._run_source, name=_block_name(self.blocks[0]))]
+        for i, block in enumerate(self.blocks[1:]):
+            output = self.edges[i+1] if i + 1 < len(self.edges) else None
+            self.threads.append(threading.Thread(target=self._run_block, args=(block, self.edges[i], output), name=_block_name(block)))
+        for thread in self.threads:
+            thread.daemon = True # so a forgotten stop() doesn't hang the interpreter on exit
+            thread.start()
+
+    # asks the source to stop, waits for everything in flight to make its way through, then stops the source itself
+    def stop(self, timeout=None):
+        self.stop_event.set()
+        self.wait(timeout)
+        if hasattr(self.blocks[0], 'stop'):
+            self.blocks[0].stop()
+
+    def wait(self, timeout=None):
+        for thread in self.threads:
+            thread.join(timeout)
+
+    def is_running(self):
+        return any(thread.is_alive() for thread in self.threads)
+
+    # per-edge queue depth, high water mark, throughput and drops
+    def metrics(self):
+        return [edge.metrics() for edge in self.edges]
+
+    def _run_source(self):
+        source = self.blocks[0]
+        output = self.edges[0]
+        recv = source.recv
+        if 'timeout' in inspect.signature(recv).parameters: # e.g. zmq_source, otherwise stop() would wait forever for the next message
+            recv = functools.partial(source.recv, timeout=0.1)
+        batch_id = 0
+        try:
+            while not self.stop_event.is_set():
+                tracing.set_batch(batch_id)
+                samples = recv()
+                if samples is None:
+                    continue
+                output.put((batch_id, np.array(samples))) # copy, because sources like usrp_source reuse their buffer
+                batch_id += 1
+        except Exception as e:
+            self.errors.append((_block_name(source), e))
+        finally:
+            output.put(_done, force=True)
+
+    def _run_block(self, block, input, output):
+        work = _work_function(block)
+        name = _block_name(block)
+        failed = False
+        while True:
+            item = input.get()
+            if item is _done:
+                break
+            if failed:
+                continue # keep draining so nothing upstream gets stuck waiting on us
+            batch_id, x = item
+            try:
+                if tracing.enabled:
+                    tracing.set_batch(batch_id)
+                    start = time.perf_counter_ns()
+                    y = work(x)
+                    tracing.record(name, start, time.perf_counter_ns() - start, len(x))
+                else:
+                    y = work(x)
+            except Exception as e:
+                self.errors.append((_block_name(block), e))
+                self.stop_event.set()
+                failed = True
+                continue
+            if output is not None and y is not None and np.size(y) > 0:
+                output.put((batch_id, y))
+        if output is not None:
+            output.put(_done)
+
+
+##############
+# UNIT TESTS #
+##############
+if __name__ == '__main__': # (call this script directly to run tests)
+    from pysdr.filters import fir_filter
+    from pysdr.decimate import decimate
+
+    # stand-in source that reuses its buffer like usrp_source does, and stops after a fixed amount of samples
+    class counting_source:
+        def __init__(self, batch_size, num_batches):
+            self.buffer = np.zeros(batch_size, dtype=np.complex64)
+            self.batches_left = num_batches
+            self.n = 0
+            self.stopped = False
+        def recv(self):
+            if self.batches_left == 0:
+                return None
+            self.buffer[:] = np.arange(self.n, self.n + len(self.buffer))
+            self.n += len(self.buffer)
+            self.batches_left -= 1
+            return self.buffer
+        def stop(self):
+            self.stopped = True
+
+    taps = np.random.rand(30)
+    out = []
+    source = counting_source(2044, 200)
+    fg = flowgraph(queue_depth=1000) # deep enough that nothing gets dropped for this test
+    fg.connect(source, fir_filter(taps), decimate(7), out.append)
+    fg.start()
+    while source.batches_left > 0:
+        threading.Event().wait(0.01)
+    fg.stop()
+    x = np.arange(2044 * 200).astype(np.complex64)
+    y = np.convolve(np.concatenate((np.zeros(len(taps) - 1), x)), taps, mode='valid')[::7]
+    print("flowgraph test passed?", np.allclose(np.concatenate(out), y) and source.stopped and not fg.is_running() and not fg.errors)
+    print("metrics test passed?", [m['name'] for m in fg.metrics()] == ['counting_source->fir_filter', 'fir_filter->decimate', 'decimate->append'] and fg.metrics()[0]['items'] == 200)
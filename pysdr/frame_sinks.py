@@ -0,0 +1,87 @@
+from __future__ import print_function # allows python3 print() to work in python2
+
+import json
+import struct
+import numpy as np
+
+# Sinks for DSP result frames (the dicts of arrays that go through a shared_channel: PSD, waterfall rows, I/Q,
+#   utilization, ...), used by pysdr_app.run_headless() on monitoring nodes where nobody is looking at a GUI.
+#   Every sink has write(frame_id, timestamp, frame) and close().
+#
+# frame_file_sink writes a compact binary file: a short header (magic, header length, JSON list of fields), then one
+#   fixed-size record per frame (frame_id, timestamp, then every field's raw bytes), so the whole file can be
+#   read back in one go as a numpy structured array with read_frame_file(), e.g.
+#       frames = pysdr.read_frame_file('monitor.frames')
+#       waterfall = frames['psd'] # num_frames x fft_size
+
+magic = b'PYSDRFRM'
+_length_format = '<I'
+
+
+def _record_dtype(fields):
+    return np.dtype([('frame_id', '<u8'), ('timestamp', '<f8')] + [(name, dtype, tuple(shape)) for name, shape, dtype in fields])
+
+
+class frame_file_sink:
+    def __init__(self, filename):
+        self.filename = filename
+        self.file = open(filename, 'wb')
+        self.record = None # structured array of one record, set up from the first frame
+
+    def write(self, frame_id, timestamp, frame):
+        if self.record is None:
+            fields = [(name, list(np.shape(frame[name])), np.asarray(frame[name]).dtype.str) for name in sorted(frame)]
+            header = json.dumps(fields).encode()
+            self.file.write(magic + struct.pack(_length_format, len(header)) + header)
+            self.record = np.zeros(1, dtype=_record_dtype(fields))
+        self.record['frame_id'] = frame_id
+        self.record['timestamp'] = timestamp
+        for name in frame:
+            self.record[name] = frame[name]
+        self.file.write(self.record.tobytes())
+
+    def close(self):
+        self.file.close()
+
+
+# returns a structured array (memory mapped, so big files are fine) with one element per frame
+def read_frame_file(filename):
+    with open(filename, 'rb') as f:
+        if f.read(len(magic)) != magic:
+            raise ValueError("%s isn't a pysdr frame file" % filename)
+        header_length = struct.unpack(_length_format, f.read(struct.calcsize(_length_format)))[0]
+        fields = json.loads(f.read(header_length).decode())
+    offset = len(magic) + struct.calcsize(_length_format) + header_length
+    return np.memmap(filename, dtype=_record_dtype(fields), mode='r', offset=offset)
+
+
+# publishes each field as its own zmq message, with the field name as the topic so subscribers can pick what they
+#   want, e.g. pysdr.zmq_source('tcp://monitor:5555', dtype=np.float32, topic=b'psd')
+class frame_zmq_sink:
+    def __init__(self, address, hwm=10, bind=True):
+        from pysdr.zmq_blocks import zmq_sink # only needs pyzmq if you actually use it
+        self.sink = zmq_sink(address, 'pubsub', hwm, bind)
+
+    def write(self, frame_id, timestamp, frame):
+        for name in sorted(frame):
+            self.sink.send(frame[name], timestamp, topic=name.encode(), block=False) # never stall the monitor for a slow subscriber
+
+    def close(self):
+        self.sink.close()
+
+
+##############
+# UNIT TESTS #
+##############
+if __name__ == '__main__': # (call this script directly to run tests)
+    import os
+    import tempfile
+
+    filename = os.path.join(tempfile.mkdtemp(), 'test.frames')
+    sink = frame_file_sink(filename)
+    psds = np.random.randn(10, 512).astype(np.float32)
+    for i in range(10):
+        sink.write(i + 1, 1000.0 + i, {'psd': psds[i], 'utilization': np.array([0.1 * i], dtype=np.float32)})
+    sink.close()
+    frames = read_frame_file(filename)
+    print("frame file test passed?", len(frames) == 10 and np.array_equal(frames['psd'], psds) and frames['timestamp'][3] == 1003.0 and frames['utilization'].shape == (10, 1))
@@ -0,0 +1,60 @@
+from __future__ import print_function # allows python3 print() to work in python2
+
+import numpy as np
+
+from pysdr.ring_buffer import ring_buffer
+from pysdr.profiling import instrumented
+
+# Streaming framer for spectrograms, Welch averaging, burst detection, etc.  Feed it batches of any size and it
+#   returns every complete frame of frame_size samples, spaced hop samples apart, as one 2D (num_frames x frame_size)
+#   strided view over the buffered samples.  The tail that isn't a complete frame yet is carried to the next call.
+#   Because it's a single 2D array you can window and FFT all the frames in one vectorized call, e.g.
+#       frames = framer1.frames(samples)
+#       PSD = np.mean(np.abs(np.fft.fft(frames * window, axis=1))**2, axis=0)
+#   The view doesn't copy anything and is only valid until the next call to frames()
+class framer:
+    def __init__(self, frame_size, hop, dtype=np.complex64):
+        if hop < 1:
+            raise ValueError("hop has to be at least 1 sample")
+        self.frame_size = frame_size
+        self.hop = hop
+        self.ring = ring_buffer(4 * frame_size, 2 * frame_size, dtype)
+
+    @instrumented
+    def frames(self, samples):
+        if len(samples) + self.frame_size > self.ring.max_read: # make room if a batch is bigger than anything we've seen before
+            self._grow(len(samples))
+        self.ring.read(0) # releases the frames handed out last time
+        self.ring.write(samples)
+        return self.ring.read_frames(self.frame_size, self.hop)
+
+    def _grow(self, batch_size):
+        old = self.ring
+        old.read(0)
+        leftover = old.peek(old.available()) if old.available() else np.zeros(0, dtype=old.buffer.dtype)
+        max_read = 2 * (batch_size + self.frame_size)
+        self.ring = ring_buffer(2 * max_read, max_read, old.buffer.dtype)
+        self.ring.write(leftover)
+
+
+##############
+# UNIT TESTS #
+##############
+if __name__ == '__main__': # (call this script directly to run tests)
+    x = np.random.randn(20000) + 1j*np.random.randn(20000) # signal
+    frame_size = 256
+    hop = 64
+
+    # simple method, one frame at a time
+    y = np.array([x[i:i+frame_size] for i in range(0, len(x) - frame_size + 1, hop)])
+
+    # streaming method using random sized batches
+    framer1 = framer(frame_size, hop, dtype=np.complex128)
+    y2 = []
+    i = 0
+    while i < len(x):
+        batch_size = np.random.randint(1, 5000) # represents how many samples come in at the same time
+        y2.append(framer1.frames(x[i:i+batch_size]).copy())
+        i += batch_size
+    y2 = np.concatenate(y2)
+    print("framer test passed?", np.array_equal(y, y2))
@@ -1,7 +1,11 @@
 from bokeh.plotting import Figure
 from bokeh.models import WheelZoomTool, BoxZoomTool, ResetTool, SaveTool # all the tools we want- reference http://bokeh.pydata.org/en/0.10.0/docs/reference/models/tools.html
-from bokeh.models import Range1d
+from bokeh.models import Range1d, FactorRange, ColumnDataSource, LinearColorMapper, CustomJS, Span
 from multiprocessing import Manager 
+import numpy as np
+
+from pysdr import colormap
+from pysdr.display_decimation import decimate_for_display
 
 '''
 Wrap Bokeh's main figure object. 
@@ -12,6 +16,16 @@ Wrap Bokeh's main figure object.
    remember, the user can choose to use Bokeh directly, so lets not go crazy with features
 '''
 
+# all the plots share one Manager, instead of each one starting its own proxy server process
+_manager = None
+def _new_input_buffer(**kwargs):
+    global _manager
+    if 'input_buffer' in kwargs: # e.g. a pysdr.shared_channel, which avoids the Manager process altogether
+        return kwargs['input_buffer']
+    if _manager is None:
+        _manager = Manager()
+    return _manager.dict()
+
 
 def base_plot(x_label, y_label, title, **kwargs):
     
@@ -55,8 +69,7 @@ def base_plot(x_label, y_label, title, **kwargs):
     plot._set_y_range = _set_y_range
     
     # Add input buffer
-    manager = Manager()
-    plot._input_buffer = manager.dict()
+    plot._input_buffer = _new_input_buffer(**kwargs)
 
     # return the bokeh figure object
     return plot  
@@ -65,20 +78,214 @@ def base_plot(x_label, y_label, title, **kwargs):
 
 # The idea behind this utilization bar is to have an "included by default" widget to show
 #    how well the process_samples is keeping up with the incoming samples, in a realtime manner
-def utilization_bar(max_y):
+# use num_bars=2 to put the load_shedder's display fraction next to it (second bar goes from x=1 to x=2)
+def utilization_bar(max_y, **kwargs):
     plot = Figure(plot_width = 150, # this is more for the ratio, because we have auto-width scaling
                   plot_height = 150,
                   tools = [], # no tools needed for this one
                   title = 'Utilization')
     plot.toolbar.logo = None  # hides logo
-    plot.x_range = Range1d(0, 1) 
+    plot.x_range = Range1d(0, kwargs.get('num_bars', 1)) 
     plot.y_range = Range1d(0, max_y)  # sometimes you want it to be way less than 1, to see it move
     plot.xaxis.visible = False # hide x axis
     # Add input buffer
-    manager = Manager()
-    plot._input_buffer = manager.dict()
+    plot._input_buffer = _new_input_buffer(**kwargs)
+    return plot
+
+# Generalization of the utilization bar, one horizontal bar per block showing what fraction of the real-time budget
+#    it's using, fed from pysdr.profiling.report() (so profiling has to be enabled with the sample rate).
+#    call plot._update(pysdr.profiling.report()) from plot_update
+def utilization_breakdown(max_x=1.0, **kwargs):
+    source = ColumnDataSource(data={'name': [], 'budget': []})
+    plot = Figure(plot_width = 300, # this is more for the ratio, because we have auto-width scaling
+                  plot_height = kwargs.get('plot_height', 200),
+                  y_range = FactorRange(),
+                  tools = [], # no tools needed for this one
+                  title = 'Utilization by Block')
+    plot.toolbar.logo = None  # hides logo
+    plot.x_range = Range1d(0, max_x)
+    plot.hbar(y='name', right='budget', height=0.8, source=source, color="#B3DE69")
+    def _update(rows):
+        names = [row['name'] for row in rows if row['budget'] is not None][::-1] # biggest on top
+        budgets = [row['budget'] for row in rows if row['budget'] is not None][::-1]
+        if list(plot.y_range.factors) != names: # only touch the range when a block shows up, so it doesn't flicker
+            plot.y_range.factors = names
+        source.data = {'name': names, 'budget': budgets}
+    plot._update = _update
+    return plot
+
+# Sends new values to a plot's ColumnDataSource with as little going over the websocket as possible, instead of
+#    replacing whole data_source.data columns every refresh.  Columns go out as float32 arrays (which Bokeh sends
+#    as binary buffers instead of JSON lists), columns that didn't change aren't sent at all, and when only part of a
+#    column changed just that span is sent with patch().  stream() appends for scrolling/strip-chart style plots.
+#    e.g.
+#       fft_updater = pysdr.source_updater(fft_line) # a renderer (what .line() etc return) or a ColumnDataSource
+#       ...
+#       fft_updater.update(y=PSD) # in plot_update
+class source_updater:
+    def __init__(self, renderer, patch_fraction=0.5):
+        self.source = getattr(renderer, 'data_source', renderer)
+        self.patch_fraction = patch_fraction # patch if less than this fraction of a column changed, otherwise replace it
+        self.last = {} # what the browser has, per column
+        self.sent = 0 # number of values actually sent, handy for checking how much this is saving
+
+    def update(self, **columns):
+        replace = {}
+        patches = {}
+        for key, values in columns.items():
+            values = np.array(values, dtype=np.float32) # always a copy, the caller's array could be a reused buffer or shared memory, and the document keeps it
+            last = self.last.get(key)
+            if last is None or last.shape != values.shape:
+                replace[key] = values
+                continue
+            changed = np.flatnonzero(values != last)
+            if len(changed) == 0:
+                continue # unchanged, nothing to send
+            start, stop = changed[0], changed[-1] + 1
+            if stop - start < self.patch_fraction * len(values):
+                patches[key] = [(slice(int(start), int(stop)), values[start:stop])]
+                self.sent += stop - start
+            else:
+                replace[key] = values
+        if replace:
+            self.source.data.update(replace) # one change event for all the replaced columns
+            self.sent += sum(len(v) for v in replace.values())
+        if patches:
+            self.source.patch(patches)
+        for key, values in columns.items():
+            if key in replace or key in patches:
+                self.last[key] = np.array(values, dtype=np.float32) # its own copy, patch() changes the one in the document
+
+    # appends new points, keeping at most rollover of them in the browser
+    def stream(self, rollover=None, **columns):
+        new_data = dict((key, np.array(values, dtype=np.float32)) for key, values in columns.items())
+        self.source.stream(new_data, rollover)
+        self.sent += sum(len(v) for v in new_data.values())
+        self.last = {} # the columns no longer match what update() last sent
+
+
+# Waterfall that only sends the new rows to the browser, instead of the whole (rows x fft_size) float64 history on
+#    every refresh.  Rows are quantized to uint8 with a fixed dB -> colour mapping (floor/ceiling in dB, or
+#    auto_levels to follow the signal, see pysdr.colormap.waterfall_renderer), and the browser keeps the history itself and scrolls it when new rows arrive.  So bandwidth
+#    depends on how many rows per second come in, not on how deep or wide the waterfall is.
+#    e.g.
+#       waterfall_plot = pysdr.waterfall_sink(fft_size, 200, floor=-100.0, ceiling=0.0)
+#       ...
+#       waterfall_plot._add_rows(new_psds) # in plot_update, one PSD (in dB) or a 2D array of them, oldest first
+#    newest row is at the top.  Browsers that connect later start from an empty waterfall
+_waterfall_js = '''
+const rows = rows_source.data['rows'][0];
+const image = image_source.data['image'][0];
+const new_rows = Math.min(rows.length / fft_size, num_rows);
+if (new_rows == 0) { return; }
+const shift = new_rows * fft_size;
+image.copyWithin(0, shift); // scroll everything down (row 0 is at the bottom)
+image.set(rows.subarray(rows.length - shift), image.length - shift); // newest rows go on top
+image_source.change.emit();
+'''
+def waterfall_sink(fft_size, num_rows, floor=-100.0, ceiling=0.0, palette='jet', auto_levels=False, **kwargs):
+    plot = base_plot(' ', 'Time', kwargs.pop('title', 'Waterfall'), disable_all_zooming=True, **kwargs)
+    plot._set_x_range(0, fft_size)
+    plot._set_y_range(0, num_rows)
+    plot.axis.visible = False
+    image_source = ColumnDataSource(data={'image': [np.zeros((num_rows, fft_size), dtype=np.uint8)]})
+    rows_source = ColumnDataSource(data={'rows': [np.zeros((0, fft_size), dtype=np.uint8)]})
+    renderer = colormap.waterfall_renderer(fft_size, num_rows, floor, ceiling, palette, auto_levels) # only its quantize(), the history lives in the browser
+    color_mapper = LinearColorMapper(palette=colormap.palette(palette), low=0, high=255)
+    plot.image(image='image', x=0, y=0, dw=fft_size, dh=num_rows, source=image_source, color_mapper=color_mapper)
+    rows_source.js_on_change('data', CustomJS(args=dict(rows_source=rows_source, image_source=image_source, fft_size=fft_size, num_rows=num_rows), code=_waterfall_js))
+    def _add_rows(rows):
+        rows = np.atleast_2d(rows)[-num_rows:] # anything older would scroll straight off anyway
+        if len(rows) == 0:
+            return
+        rows_source.data = {'rows': [renderer.quantize(rows)]}
+    plot._add_rows = _add_rows
     return plot
 
+
+# Time sink for a pysdr.trigger, the x axis is time relative to the trigger point (negative for the pre-trigger
+#    part) and a dashed marker sits at t=0.  The trigger runs in the DSP, on every batch, this only draws its captures
+#    e.g.
+#       time_plot = pysdr.triggered_time_sink(500, samp_rate, pre_trigger=100)
+#       ...
+#       time_plot._update(capture) # in plot_update, complex samples, e.g. trig.latest
+def triggered_time_sink(num_points, samp_rate, pre_trigger=0, **kwargs):
+    plot = base_plot('Time [ms]', ' ', kwargs.pop('title', 'Triggered Time Sink'), disable_horizontal_zooming=True, **kwargs)
+    t = (np.arange(num_points) - pre_trigger) / float(samp_rate) * 1e3
+    i_line = plot.line(t, np.zeros(num_points), color="aqua", line_width=1)
+    q_line = plot.line(t, np.zeros(num_points), color="red", line_width=1)
+    plot.add_layout(Span(location=0, dimension='height', line_color='white', line_dash='dashed', line_width=1))
+    i_updater = source_updater(i_line)
+    q_updater = source_updater(q_line)
+    def _update(samples):
+        i_updater.update(y=np.real(samples))
+        q_updater.update(y=np.imag(samples))
+    plot._update = _update
+    return plot
+
+
+# Density images (see pysdr.histograms), the browser only ever gets the histogram as uint8 colour indices, however
+#    many samples went into it.  Row 0 of the image is at the bottom of the plot
+def _density_plot(x_label, y_label, title, x_range, y_range, shape, palette, **kwargs):
+    plot = base_plot(x_label, y_label, title, **kwargs)
+    plot._set_x_range(*x_range)
+    plot._set_y_range(*y_range)
+    image_source = ColumnDataSource(data={'image': [np.zeros(shape, dtype=np.uint8)]})
+    color_mapper = LinearColorMapper(palette=colormap.palette(palette), low=0, high=255)
+    plot.image(image='image', x=x_range[0], y=y_range[0], dw=x_range[1]-x_range[0], dh=y_range[1]-y_range[0], source=image_source, color_mapper=color_mapper)
+    def _update(image):
+        image_source.data = {'image': [np.asarray(image, dtype=np.uint8)]}
+    plot._update = _update
+    return plot
+
+
+# Constellation drawn as a density image instead of a few hundred circles
+#    e.g.
+#       iq_plot = pysdr.constellation_density_sink(128, max_amplitude=1.0)
+#       ...
+#       iq_plot._update(constellation.to_uint8()) # in plot_update
+def constellation_density_sink(num_bins, max_amplitude=1.0, palette='viridis', **kwargs):
+    return _density_plot('I', 'Q', kwargs.pop('title', 'IQ Plot'), (-max_amplitude, max_amplitude), (-max_amplitude, max_amplitude), (num_bins, num_bins), palette, **kwargs)
+
+
+# Eye diagram from a pysdr.eye_histogram, x axis in symbols
+#    e.g.
+#       eye_plot = pysdr.eye_diagram_sink(eye.num_phase_bins, eye.num_amplitude_bins, num_symbols=2, min_amplitude=0.0, max_amplitude=1.0)
+#       ...
+#       eye_plot._update(eye.to_uint8()) # in plot_update
+def eye_diagram_sink(num_phase_bins, num_amplitude_bins=128, num_symbols=2, min_amplitude=-1.0, max_amplitude=1.0, palette='viridis', **kwargs):
+    return _density_plot('Symbols', ' ', kwargs.pop('title', 'Eye Diagram'), (0, num_symbols), (min_amplitude, max_amplitude), (num_amplitude_bins, num_phase_bins), palette, **kwargs)
+
+
+# Line on a base_plot that only ever sends about num_pixels points to the browser (see pysdr.display_decimation),
+#    no matter how long the trace is, and re-sends the detail for the visible part whenever the user zooms or pans.
+#    mode='minmax' for time traces, mode='max' for spectra, so peaks stay visible either way.
+#    e.g.
+#       fft_line = pysdr.decimated_line(fft_plot, f, mode='max', color="aqua")
+#       ...
+#       fft_line._update(PSD) # in plot_update, full resolution
+def decimated_line(plot, x, y=None, mode='minmax', num_pixels=1024, **kwargs):
+    source = ColumnDataSource(data={'x': np.zeros(0, dtype=np.float32), 'y': np.zeros(0, dtype=np.float32)})
+    renderer = plot.line('x', 'y', source=source, **kwargs)
+    state = {'x': np.asarray(x), 'y': np.zeros(len(x)) if y is None else np.asarray(y), 'range': None}
+    def _redraw(*args):
+        if state['range'] is not plot.x_range: # _set_x_range() swaps in a new range object, so listen to whichever is current
+            state['range'] = plot.x_range
+            plot.x_range.on_change('start', _redraw)
+            plot.x_range.on_change('end', _redraw)
+        visible = [v if isinstance(v, (int, float)) and np.isfinite(v) else None for v in (plot.x_range.start, plot.x_range.end)] # auto ranges can start out unset
+        xs, ys = decimate_for_display(state['x'], state['y'], num_pixels, visible[0], visible[1], mode)
+        source.data = {'x': xs.astype(np.float32), 'y': ys.astype(np.float32)}
+    def _update(y, x=None):
+        if x is not None:
+            state['x'] = np.asarray(x)
+        state['y'] = np.array(y) # copy, the DSP side may reuse its buffer
+        _redraw()
+    renderer._update = _update
+    _redraw()
+    return renderer
+
+
 '''  couldent quite get this object wrapper to work, maybe in Bokeh it checks if the object is type "Figure"
 class base_plot2(Figure):
     # add more intuitive functions to set x and y ranges
@@ -0,0 +1,134 @@
+from __future__ import print_function # allows python3 print() to work in python2
+
+import numpy as np
+
+from pysdr import colormap
+
+# Persistent 2D histograms for density-style displays.  Instead of scattering the first few hundred samples of a
+#   batch, every sample lands in a fixed grid of bins with one vectorized np.bincount, and the older counts fade by
+#   decay each time a batch is added.  The display is then an image of num_bins x num_bins no matter the sample
+#   rate, so drawing it costs the same at 10 Msps as at 100 ksps, and it shows where the signal actually spends its time.
+#   constellation_histogram bins I against Q, eye_histogram bins amplitude against position within the symbol.
+#   e.g.
+#       constellation = pysdr.constellation_histogram(num_bins=128, max_amplitude=1.0, decay=0.8)
+#       constellation.add(samples) # the whole batch
+#       image = constellation.to_uint8() # (num_bins x num_bins) colour indices, row 0 is the most negative Q
+
+
+class constellation_histogram:
+    def __init__(self, num_bins=128, max_amplitude=1.0, decay=0.8):
+        self.num_bins = num_bins
+        self.max_amplitude = max_amplitude # I and Q from -max_amplitude to +max_amplitude, anything outside isn't counted
+        self.decay = decay # fraction of the old counts kept each time add() is called, 0 means only show the latest batch
+        self.counts = np.zeros(num_bins * num_bins, dtype=np.float32)
+
+    def add(self, samples):
+        scale = self.num_bins / (2.0 * self.max_amplitude)
+        i_bins = (np.real(samples).astype(np.float32) + self.max_amplitude) * scale
+        q_bins = (np.imag(samples).astype(np.float32) + self.max_amplitude) * scale
+        in_range = (i_bins >= 0) & (i_bins < self.num_bins) & (q_bins >= 0) & (q_bins < self.num_bins)
+        indices = q_bins[in_range].astype(np.intp) * self.num_bins + i_bins[in_range].astype(np.intp)
+        self.counts *= self.decay
+        self.counts += np.bincount(indices, minlength=self.num_bins * self.num_bins)
+        return self.image
+
+    # (num_bins x num_bins) counts, rows are Q and columns are I, so it can be drawn as an image with its origin at the bottom left
+    @property
+    def image(self):
+        return self.counts.reshape(self.num_bins, self.num_bins)
+
+    # colour indices on a log scale, the busiest bin is 255 and anything dynamic_range dB below it (or empty) is 0
+    def to_uint8(self, dynamic_range=40.0, out=None):
+        return _density_to_uint8(self.image, dynamic_range, out)
+
+    def reset(self):
+        self.counts[:] = 0
+
+
+# Eye diagram, the stream is cut into traces num_symbols symbols long and every sample is binned by where it falls
+#   within its trace (columns) and by its amplitude (rows).  The position comes from a running sample count, so the
+#   alignment carries over from one batch to the next and samples_per_symbol doesn't have to be an integer.
+#   component is what gets plotted: 'real', 'imag' or 'magnitude' (e.g. for OOK), pass already demodulated real
+#   samples for FSK.  offset [samples] shifts where the traces start, to put the eye opening in the middle
+class eye_histogram:
+    def __init__(self, samples_per_symbol, num_symbols=2, num_phase_bins=None, num_amplitude_bins=128, min_amplitude=-1.0, max_amplitude=1.0, decay=0.8, component='real', offset=0.0):
+        if component not in ('real', 'imag', 'magnitude'):
+            raise ValueError("component has to be 'real', 'imag' or 'magnitude'")
+        self.trace_length = samples_per_symbol * num_symbols # [samples]
+        self.num_symbols = num_symbols
+        self.num_phase_bins = num_phase_bins or max(1, int(round(self.trace_length))) # default is one column per sample
+        self.num_amplitude_bins = num_amplitude_bins
+        self.min_amplitude = min_amplitude
+        self.max_amplitude = max_amplitude
+        self.decay = decay
+        self.component = component
+        self.offset = offset
+        self.sample_count = 0 # samples seen so far, which is what keeps the traces aligned across batches
+        self.counts = np.zeros(self.num_amplitude_bins * self.num_phase_bins, dtype=np.float32)
+
+    def add(self, samples):
+        if self.component == 'real':
+            values = np.real(samples)
+        elif self.component == 'imag':
+            values = np.imag(samples)
+        else:
+            values = np.abs(samples)
+        n = len(values)
+        positions = np.arange(self.sample_count, self.sample_count + n, dtype=np.float64)
+        self.sample_count += n
+        phase_bins = (np.mod(positions - self.offset, self.trace_length) * (self.num_phase_bins / self.trace_length)).astype(np.intp)
+        np.minimum(phase_bins, self.num_phase_bins - 1, out=phase_bins) # float rounding right at the end of a trace
+        amplitude_bins = (values.astype(np.float32) - self.min_amplitude) * (self.num_amplitude_bins / (self.max_amplitude - self.min_amplitude))
+        in_range = (amplitude_bins >= 0) & (amplitude_bins < self.num_amplitude_bins)
+        indices = amplitude_bins[in_range].astype(np.intp) * self.num_phase_bins + phase_bins[in_range]
+        self.counts *= self.decay
+        self.counts += np.bincount(indices, minlength=len(self.counts))
+        return self.image
+
+    # (num_amplitude_bins x num_phase_bins) counts, row 0 is min_amplitude and column 0 is the start of a trace
+    @property
+    def image(self):
+        return self.counts.reshape(self.num_amplitude_bins, self.num_phase_bins)
+
+    def to_uint8(self, dynamic_range=40.0, out=None):
+        return _density_to_uint8(self.image, dynamic_range, out)
+
+    def reset(self):
+        self.counts[:] = 0
+
+
+def _density_to_uint8(counts, dynamic_range, out=None):
+    peak = np.max(counts)
+    if peak <= 0:
+        return colormap.quantize(np.zeros(counts.shape), 1.0, 2.0, out) # empty, all floor
+    with np.errstate(divide='ignore'): # empty bins go to -inf, which quantize() clips to the floor
+        db = 10.0 * np.log10(counts / peak)
+    return colormap.quantize(db, -dynamic_range, 0.0, out)
+
+
+##############
+# UNIT TESTS #
+##############
+if __name__ == '__main__': # (call this script directly to run tests)
+    qpsk = (np.random.randint(0, 2, 100000) * 2 - 1 + 1j * (np.random.randint(0, 2, 100000) * 2 - 1)) * 0.5
+    qpsk += 0.02 * (np.random.randn(100000) + 1j * np.random.randn(100000))
+    h = constellation_histogram(num_bins=64, max_amplitude=1.0, decay=0.5)
+    image = h.add(qpsk)
+    corners = sum(np.sum(image[q - 4:q + 4, i - 4:i + 4]) for q in (16, 48) for i in (16, 48)) # +-0.5 is around bins 16 and 48
+    print("constellation test passed?", np.sum(image) == 100000 and corners == 100000 and image[32, 32] == 0)
+    h.add(np.array([5.0 + 5.0j, 0.5 + 0.5j])) # first one is out of range
+    print("decay test passed?", np.isclose(np.sum(h.image), 50001) and h.image[48, 48] > 0)
+    u = h.to_uint8()
+    print("uint8 test passed?", u.dtype == np.uint8 and u.shape == (64, 64) and np.max(u) == 255 and u[32, 32] == 0)
+
+    # OOK at 8.5 samples per symbol fed in odd sized batches, every trace should line up into a clean eye
+    bits = np.random.randint(0, 2, 2000)
+    ook = np.repeat(bits, 17).astype(np.float32)[::2] # 8.5 samples per symbol
+    eye = eye_histogram(8.5, num_symbols=2, num_amplitude_bins=20, min_amplitude=-0.5, max_amplitude=1.5, decay=1.0, component='magnitude')
+    for start in range(0, len(ook), 777):
+        eye.add(ook[start:start + 777])
+    levels = np.sum(eye.image, axis=1)
+    print("eye test passed?", eye.image.shape == (20, 17) and np.sum(eye.image) == len(ook) and levels[5] + levels[15] == len(ook))
+    whole = eye_histogram(8.5, num_symbols=2, num_amplitude_bins=20, min_amplitude=-0.5, max_amplitude=1.5, decay=1.0, component='magnitude')
+    whole.add(ook)
+    print("eye alignment test passed?", np.array_equal(eye.image, whole.image)) # batch boundaries don't matter
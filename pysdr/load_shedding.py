@@ -0,0 +1,103 @@
+from __future__ import print_function # allows python3 print() to work in python2
+
+import time
+
+# Load-aware replacement for a fixed chunk_decimation_factor.  It measures how much of the real-time budget each
+#   batch uses (utilization, same definition as the utilization bar: processing time / time the samples represent)
+#   and adjusts what fraction of batches the display path gets to process, so the GUI gets the highest fidelity the
+#   host can sustain without overflows.  Only the display path is shed, anything that must see every sample
+#   (recording, demod) just runs on every batch and its cost is included in the measurement.
+#   e.g.
+#       shedder.begin()
+#       record(samples)                  # never shed
+#       if shedder.should_process():
+#           update_display(samples)      # shed as needed
+#       shedder.end(len(samples))
+#   The display path often only runs once per accumulated block (should_process() asked every N batches), so the
+#   measurement covers the same window as the decision: busy time is summed over every batch from one decision up to
+#   the end of the batch that made the next one, and that is one update().  So the cost of a processed block is
+#   always measured together with the idle batches around it, and utilization includes it as soon as end() returns.
+class load_shedder:
+    def __init__(self, samp_rate, target_utilization=0.7, min_fraction=0.001, increase=0.01, decrease=0.8, smoothing=0.05):
+        self.samp_rate = samp_rate
+        self.target_utilization = target_utilization # leave some headroom for the OS, GUI thread, bursts, etc
+        self.min_fraction = min_fraction
+        self.increase = increase # additive increase of the fraction when we have headroom
+        self.decrease = decrease # multiplicative decrease when we are over the target (AIMD, like TCP)
+        self.smoothing = smoothing # weight of the newest decision window in the utilization moving average
+        self.fraction = 1.0 # fraction of batches the display path processes
+        self.utilization = 0.0 # smoothed utilization, this is what goes in the utilization bar
+        self.credit = 0.0 # spreads the processed batches out evenly instead of in bursts
+        self.processed = 0
+        self.shed = 0
+        self.start_time = None
+        self.window_busy = 0.0 # [seconds] busy time since the last decision window closed
+        self.window_samples = 0
+        self.decided = False # should_process() was called since the last window closed
+
+    def begin(self):
+        self.start_time = time.perf_counter()
+
+    # True if the display path should process this batch
+    def should_process(self):
+        self.decided = True
+        self.credit += self.fraction
+        if self.credit >= 1.0:
+            self.credit -= 1.0
+            self.processed += 1
+            return True
+        self.shed += 1
+        return False
+
+    # call once per batch (processed or not), with the number of samples in it
+    def end(self, num_samples):
+        self.record(time.perf_counter() - self.start_time, num_samples)
+
+    # same as begin()/end() for an app that times its batches itself, busy in seconds
+    def record(self, busy, num_samples):
+        self.window_busy += busy
+        self.window_samples += num_samples
+        if self.decided and self.window_samples:
+            self.update(self.window_busy / (self.window_samples / float(self.samp_rate)))
+            self.window_busy = 0.0
+            self.window_samples = 0
+            self.decided = False
+
+    # feed in a utilization measurement directly (one per decision), if begin()/end() don't fit the way the app is structured
+    def update(self, utilization):
+        self.utilization += self.smoothing * (utilization - self.utilization)
+        if self.utilization > self.target_utilization:
+            self.fraction = max(self.min_fraction, self.fraction * self.decrease)
+        else:
+            self.fraction = min(1.0, self.fraction + self.increase)
+
+
+##############
+# UNIT TESTS #
+##############
+if __name__ == '__main__': # (call this script directly to run tests)
+    # pretend the display path costs 3x real-time, and everything else 10%, so it should settle around (0.7-0.1)/3 = 20%
+    shedder = load_shedder(1e6, smoothing=0.2)
+    fractions = []
+    for i in range(5000):
+        utilization = 0.1
+        if shedder.should_process():
+            utilization += 3.0
+        shedder.update(utilization)
+        fractions.append(shedder.fraction)
+    settled = sum(fractions[-1000:]) / 1000.0
+    print("load_shedder test passed?", 0.1 < settled < 0.3, "(settled at %.2f)" % settled)
+
+    # the demo's pattern: 2000 sample batches at 10% utilization, and every 50th batch completes an accumulated block
+    #   that costs 3x the 100 ms it represents, so again it should settle around 20% of the blocks
+    shedder = load_shedder(1e6, smoothing=0.2)
+    fractions = []
+    for i in range(50 * 2000):
+        busy = 0.1 * 2e-3
+        if i % 50 == 49 and shedder.should_process():
+            busy += 3.0 * 0.1
+        shedder.record(busy, 2000)
+        if i % 50 == 49:
+            fractions.append(shedder.fraction)
+    settled = sum(fractions[-500:]) / 500.0
+    print("decision window test passed?", 0.1 < settled < 0.3 and shedder.shed > 0, "(settled at %.2f)" % settled)
@@ -0,0 +1,67 @@
+from __future__ import print_function # allows python3 print() to work in python2
+
+import time
+
+# Paces a simulated or replayed source at a real sample rate, so the rest of the app sees samples arrive the way a
+#   radio delivers them.  Packets are scheduled on an absolute timeline (start time + samples so far / rate) instead
+#   of sleeping a fixed amount per packet, so sleep() jitter and the time spent making each packet never add up to
+#   drift.  If the consumer falls more than max_lag seconds behind, that's what would have overflowed the radio's
+#   buffer, so the pacer skips ahead to "now" and reports how many samples were lost, like a real overflow.
+#       pacer1 = pacer(samp_rate)
+#       dropped = pacer1.wait(len(packet)) # blocks until the packet is due
+class pacer:
+    def __init__(self, samp_rate, speed=1.0, max_lag=0.1):
+        self.samp_rate = samp_rate
+        self.speed = speed # e.g. 2.0 to run at twice the real sample rate
+        self.max_lag = max_lag # [seconds] how far behind the consumer can get before we call it an overflow
+        self.overflows = 0
+        self.dropped = 0 # total samples skipped because of overflows
+        self.reset()
+
+    def reset(self):
+        self.start_time = None
+        self.sample_count = 0 # samples delivered (and dropped) since the start
+
+    # how far behind the schedule we are right now, in seconds (negative means early)
+    def lag(self):
+        if self.start_time is None:
+            return 0.0
+        return time.perf_counter() - self._due(self.sample_count)
+
+    # blocks until num_samples more samples are due, returns how many samples were dropped (0 unless we overflowed)
+    def wait(self, num_samples):
+        now = time.perf_counter()
+        if self.start_time is None:
+            self.start_time = now
+        due = self._due(self.sample_count + num_samples)
+        dropped = 0
+        if now < due:
+            time.sleep(due - now)
+        elif now - due > self.max_lag:
+            dropped = int((now - due) * self.samp_rate * self.speed) # skip ahead to now, those samples are gone
+            self.overflows += 1
+            self.dropped += dropped
+        self.sample_count += num_samples + dropped
+        return dropped
+
+    def _due(self, sample_count):
+        return self.start_time + sample_count / (self.samp_rate * self.speed)
+
+
+##############
+# UNIT TESTS #
+##############
+if __name__ == '__main__': # (call this script directly to run tests)
+    pacer1 = pacer(1e6)
+    start = time.perf_counter()
+    for i in range(100):
+        pacer1.wait(1000) # 100 ms worth of samples
+        time.sleep(0.0005 if i % 2 else 0.0) # uneven per-packet work, which a fixed sleep would turn into drift
+    elapsed = time.perf_counter() - start
+    print("pacing test passed?", 0.099 < elapsed < 0.11 and pacer1.overflows == 0, "(took %.4f s)" % elapsed)
+
+    pacer2 = pacer(1e6, speed=2.0, max_lag=0.01)
+    pacer2.wait(1000)
+    time.sleep(0.05) # consumer stalls for 50 ms, i.e. 100k samples at 2x speed
+    dropped = pacer2.wait(1000)
+    print("overflow test passed?", pacer2.overflows == 1 and 90000 < dropped < 110000)
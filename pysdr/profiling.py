@@ -0,0 +1,208 @@
+from __future__ import print_function # allows python3 print() to work in python2
+
+import functools
+import threading
+import time
+import tracemalloc
+
+from pysdr import tracing
+
+# Opt-in instrumentation for pysdr blocks, generalizing the utilization bar from one hand-computed number to a
+#   per-block breakdown of who is using the real-time budget.  It's off by default and then costs one global check
+#   per call.  Turn it on with
+#       pysdr.profiling.enable(samp_rate)
+#   and every instrumented block (fir_filter, decimate, psd, ...) records its wall time (perf_counter_ns), the
+#   samples it processed, and the net bytes it left allocated (its output plus anything it keeps around).  Bytes come
+#   from tracemalloc, which numpy reports its array buffers to, so enable() starts it, and that slows down every
+#   allocation a bit while profiling is on.  report() turns that into Msps and the fraction of the real-time
+#   budget each block uses, and gui.utilization_breakdown() shows it as a bar chart.
+#   Instrumented calls can nest (e.g. a profile()d process_samples calling fir_filter), so each one records its
+#   exclusive time and bytes, what's left after its instrumented children, and the budgets add up.
+#   Your own functions can be instrumented with pysdr.profiling.profile(my_function)
+#   The same hooks also feed pysdr.tracing when that is enabled
+
+enabled = False
+samp_rate = None # needed for the real-time budget numbers
+registry = {} # name -> block_stats, in the order blocks first ran
+_instance_counts = {} # block type -> how many instances have been registered
+_local = threading.local() # per thread stack of [ns, bytes] used by the instrumented calls in progress
+_started_tracemalloc = False # so disable() only stops it if enable() was the one that started it
+
+
+class block_stats:
+    def __init__(self, name):
+        self.name = name
+        self.calls = 0
+        self.samples = 0
+        self.total_ns = 0
+        self.max_ns = 0
+        self.allocated_bytes = 0
+
+    def record(self, elapsed_ns, num_samples, allocated_bytes=0):
+        self.calls += 1
+        self.samples += num_samples
+        self.total_ns += elapsed_ns
+        self.max_ns = max(self.max_ns, elapsed_ns)
+        self.allocated_bytes += allocated_bytes
+
+
+def enable(sample_rate=None):
+    global enabled, samp_rate, _started_tracemalloc
+    samp_rate = sample_rate
+    if not tracemalloc.is_tracing():
+        tracemalloc.start()
+        _started_tracemalloc = True
+    enabled = True
+
+
+def disable():
+    global enabled, _started_tracemalloc
+    enabled = False
+    if _started_tracemalloc:
+        tracemalloc.stop()
+        _started_tracemalloc = False
+
+
+def _traced_bytes():
+    return tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else 0
+
+
+def reset():
+    registry.clear()
+    _instance_counts.clear()
+
+
+def get_stats(name):
+    if name not in registry:
+        registry[name] = block_stats(name)
+    return registry[name]
+
+
+# gives each block instance its own entry, e.g. fir_filter, fir_filter_2, ...
+def _stats_for(block):
+    stats = block.__dict__.get('_profiling_stats')
+    if stats is None or registry.get(stats.name) is not stats: # first call, or since a reset()
+        name = type(block).__name__
+        _instance_counts[name] = _instance_counts.get(name, 0) + 1
+        stats = get_stats(name if _instance_counts[name] == 1 else '%s_%d' % (name, _instance_counts[name]))
+        block._profiling_stats = stats
+    return stats
+
+
+# runs function(x, ...) and returns (out, start, elapsed_ns, exclusive_ns, exclusive_bytes), where exclusive
+#   leaves out whatever instrumented calls it made itself
+def _timed(function, x, args, kwargs):
+    stack = _local.__dict__.setdefault('stack', [])
+    stack.append([0, 0]) # filled in by our children
+    bytes_before = _traced_bytes()
+    start = time.perf_counter_ns()
+    try:
+        out = function(x, *args, **kwargs)
+    finally:
+        elapsed = time.perf_counter_ns() - start
+        allocated = _traced_bytes() - bytes_before
+        child_ns, child_bytes = stack.pop()
+        if stack:
+            stack[-1][0] += elapsed
+            stack[-1][1] += allocated
+    return out, start, elapsed, elapsed - child_ns, allocated - child_bytes
+
+
+# decorator for block methods of the form work(self, x), this is what the pysdr blocks use
+def instrumented(method):
+    @functools.wraps(method)
+    def wrapper(self, x, *args, **kwargs):
+        if not (enabled or tracing.enabled):
+            return method(self, x, *args, **kwargs)
+        out, start, elapsed, exclusive, allocated = _timed(functools.partial(method, self), x, args, kwargs)
+        stats = _stats_for(self)
+        if enabled:
+            stats.record(exclusive, len(x), allocated)
+        if tracing.enabled:
+            tracing.record(stats.name, start, elapsed, len(x)) # the trace shows the nesting itself
+        return out
+    return wrapper
+
+
+# same thing for a plain function of one batch
+def profile(function, name=None):
+    stats_name = name if name is not None else getattr(function, '__name__', 'function')
+    @functools.wraps(function)
+    def wrapper(x, *args, **kwargs):
+        if not (enabled or tracing.enabled):
+            return function(x, *args, **kwargs)
+        out, start, elapsed, exclusive, allocated = _timed(function, x, args, kwargs)
+        if enabled:
+            get_stats(stats_name).record(exclusive, len(x), allocated)
+        if tracing.enabled:
+            tracing.record(stats_name, start, elapsed, len(x))
+        return out
+    return wrapper
+
+
+# one dict per block, biggest user of the real-time budget first.  budget is processing time / time the samples
+#   represent (same as the utilization bar), so anything approaching 1.0 can't keep up on its own
+def report():
+    rows = []
+    for stats in registry.values():
+        if stats.calls == 0:
+            continue
+        msps = stats.samples / (stats.total_ns / 1e3) if stats.total_ns else float('inf')
+        row = {'name': stats.name,
+               'calls': stats.calls,
+               'samples': stats.samples,
+               'msps': msps,
+               'avg_us': stats.total_ns / 1e3 / stats.calls,
+               'max_us': stats.max_ns / 1e3,
+               'kb_per_call': stats.allocated_bytes / 1e3 / stats.calls,
+               'budget': None}
+        if samp_rate:
+            row['budget'] = (stats.total_ns / 1e9) / (stats.samples / float(samp_rate)) if stats.samples else 0.0
+        rows.append(row)
+    return sorted(rows, key=lambda row: -(row['budget'] if row['budget'] is not None else row['avg_us']))
+
+
+def summary():
+    lines = ['%-20s %8s %12s %10s %10s %10s %8s %8s' % ('block', 'calls', 'samples', 'Msps', 'avg [us]', 'max [us]', 'kB', 'budget')]
+    for row in report():
+        budget = '%7.1f%%' % (100 * row['budget']) if row['budget'] is not None else '       -'
+        lines.append('%-20s %8d %12d %10.1f %10.1f %10.1f %8.1f %s' % (row['name'], row['calls'], row['samples'], row['msps'], row['avg_us'], row['max_us'], row['kb_per_call'], budget))
+    return '\n'.join(lines)
+
+
+##############
+# UNIT TESTS #
+##############
+if __name__ == '__main__': # (call this script directly to run tests)
+    import numpy as np
+    import pysdr.profiling as profiling # the blocks use the module, not this __main__ copy of it
+    from pysdr.filters import fir_filter
+    from pysdr.decimate import decimate
+
+    filter1 = fir_filter(np.random.rand(100))
+    filter2 = fir_filter(np.random.rand(10))
+    decimator = decimate(4)
+    x = np.random.randn(10000) + 1j*np.random.randn(10000)
+    filter1.filter(x) # disabled, so nothing should be recorded
+    print("disabled test passed?", len(profiling.registry) == 0)
+    profiling.enable(1e6)
+    for i in range(20):
+        decimator.decimate(filter2.filter(filter1.filter(x)))
+    names = [row['name'] for row in profiling.report()]
+    print("registry test passed?", sorted(names) == ['decimate', 'fir_filter', 'fir_filter_2'] and profiling.registry['fir_filter'].samples == 200000)
+    print(profiling.summary())
+    kb = dict((row['name'], row['kb_per_call']) for row in profiling.report())
+    print("allocation test passed?", 150 < kb['fir_filter'] < 200 and kb['decimate'] < 1) # a new 10000 sample complex128 output vs a view
+
+    # a profile()d function calling instrumented blocks only gets charged for its own time
+    profiling.reset()
+    def process_samples(x):
+        time.sleep(0.01)
+        return filter1.filter(x)
+    process_samples = profiling.profile(process_samples)
+    start = time.perf_counter_ns()
+    for i in range(5):
+        process_samples(x)
+    wall = time.perf_counter_ns() - start
+    outer, inner = profiling.registry['process_samples'], profiling.registry['fir_filter']
+    print("nesting test passed?", 0.9 * wall < outer.total_ns + inner.total_ns <= wall and outer.total_ns >= 5 * 0.01e9)
@@ -1,25 +1,23 @@
 from __future__ import print_function # allows python3 print() to work in python2
 
-from flask import Flask, render_template 
+import itertools
+import time
 
-from tornado.ioloop import IOLoop
-from tornado.httpserver import HTTPServer
-from tornado.wsgi import WSGIContainer
+from pysdr import tracing
 
-from bokeh.application import Application
-from bokeh.application.handlers import FunctionHandler
-from bokeh.embed import server_document
-from bokeh.server.server import Server
-from bokeh.util.browser import view # utility to Open a browser to view the specified location.
-
-from multiprocessing import Process, Manager 
-
-from pysdr.themes import black_and_white # removed relative imports to work with python3
+# Flask, tornado and Bokeh are imported inside the methods that use them, so a headless app never loads the GUI stack
 
 # This is the equivalent of top block. in reality it's just doing the Bokeh and Flask stuff, not DSP
+#   headless=True is for monitoring nodes with no display: skip the web/Bokeh servers and use run_headless() to send
+#   the DSP results (whatever the DSP writes to its shared_channel) to a file or a socket instead
 class pysdr_app:
-    def __init__(self):
+    def __init__(self, headless=False):
         print("creating new app")
+        self.headless = headless
+        if headless:
+            return
+        from flask import Flask, render_template
+        from bokeh.embed import server_document
         self.flask_app = Flask('__main__') # use '__main__' because this script is the top level
 
         # GET routine for root page
@@ -28,23 +26,97 @@ class pysdr_app:
             script = server_document(url='http://localhost:5006/bkapp')
             return render_template('index.html', script=script)
     
-    def assemble_bokeh_doc(self, widgets, plots, plot_update, theme):
+    # adaptive=True replaces the fixed 150 ms refresh with a pysdr.refresh_controller, which needs plot_update to return
+    #   False when it had nothing new to show.  utilization is an optional function returning the DSP utilization,
+    #   so the GUI can back off when the DSP is busy.  The achieved refresh rate is in self.refresh_controllers[i].fps
+    #   Like the broadcaster, a browser with max_in_flight frames not acked yet skips refreshes until it catches up
+    def assemble_bokeh_doc(self, widgets, plots, plot_update, theme, adaptive=False, utilization=None, max_in_flight=2):
+        from bokeh.application import Application
+        from bokeh.application.handlers import FunctionHandler
+        plot_update = tracing.traced(plot_update) # so it shows up next to the DSP in a trace
+        self.refresh_controllers = []
         def main_doc(doc):
             doc.add_root(widgets)  # add the widgets to the document
             doc.add_root(plots)  # Add four plots to document, using the gridplot method of arranging them
-            doc.add_periodic_callback(plot_update, 150)  # Add a periodic callback to be run every x milliseconds
+            if adaptive:
+                self._start_adaptive_refresh(doc, plot_update, utilization, max_in_flight)
+            else:
+                doc.add_periodic_callback(plot_update, 150)  # Add a periodic callback to be run every x milliseconds
             doc.theme = theme
  
         # Create bokeh app
         self.bokeh_app = Application(FunctionHandler(main_doc)) # Application is "a factory for Document instances" and FunctionHandler "runs a function which modifies a document"
         
+    # reschedules itself after every refresh with whatever period the controller picks, the browser acks every frame
+    def _start_adaptive_refresh(self, doc, plot_update, utilization, max_in_flight):
+        from pysdr.broadcast import ack_session
+        from pysdr.refresh import refresh_controller
+        session = ack_session(doc, lambda snapshot: plot_update()) # plot_update reads the DSP output itself
+        session.attach_ack()
+        controller = refresh_controller()
+        self.refresh_controllers.append(controller)
+        frame_ids = itertools.count(1)
+        def refresh():
+            new_frame = False
+            try:
+                session.expire()
+                if len(session.outstanding) >= max_in_flight:
+                    session.dropped += 1 # this browser is behind, don't pile more onto it
+                else:
+                    frame_id = next(frame_ids)
+                    session.outstanding.append((frame_id, time.perf_counter()))
+                    new_frame = session.send(frame_id, None)
+            finally: # always reschedule, one bad frame shouldn't freeze this session for good
+                period = controller.update(new_frame, session.latency(), utilization() if utilization is not None else None)
+                doc.add_timeout_callback(refresh, period * 1000)
+        doc.add_timeout_callback(refresh, controller.period * 1000)
+
+    # the multi-browser version of assemble_bokeh_doc(): make_session(doc) builds one session's plots and returns its
+    #   apply(snapshot), and snapshot() runs once per frame no matter how many browsers are open (see pysdr.broadcast)
+    #   adaptive and utilization work the same as for assemble_bokeh_doc(), with snapshot() returning None for nothing new
+    def assemble_broadcast_doc(self, make_session, snapshot, theme, period=0.15, max_in_flight=2, adaptive=False, utilization=None, ack_timeout=1.0):
+        from bokeh.application import Application
+        from bokeh.application.handlers import FunctionHandler
+        from pysdr.broadcast import broadcaster
+        from pysdr.refresh import refresh_controller
+        self.broadcaster = broadcaster(snapshot, max_in_flight, ack_timeout)
+        self.broadcast_period = period
+        self.broadcast_controller = refresh_controller(period=period) if adaptive else None
+        self.broadcast_utilization = utilization
+        def main_doc(doc):
+            apply = make_session(doc)
+            doc.theme = theme
+            self.broadcaster.add_session(doc, apply)
+        self.bokeh_app = Application(FunctionHandler(main_doc))
+
     def create_bokeh_server(self):
+        from tornado.ioloop import IOLoop
+        from bokeh.server.server import Server
         self.io_loop = IOLoop.current() # creates an IOLoop for the current thread
         # Create the Bokeh server, which "instantiates Application instances as clients connect".  We tell it the bokeh app and the ioloop to use
         server = Server({'/bkapp': self.bokeh_app}, io_loop=self.io_loop, allow_websocket_origin=["localhost:8080"]) 
         server.start() # Start the Bokeh Server and its background tasks. non-blocking and does not affect the state of the IOLoop
+        if getattr(self, 'broadcaster', None) is not None: # one producer tick for all the sessions, instead of a callback per document
+            if self.broadcast_controller is not None:
+                self.io_loop.call_later(self.broadcast_period, self._adaptive_broadcast)
+            else:
+                from tornado.ioloop import PeriodicCallback
+                self.broadcast_callback = PeriodicCallback(self.broadcaster.tick, self.broadcast_period * 1000)
+                self.broadcast_callback.start()
+
+    def _adaptive_broadcast(self):
+        new_frame = False
+        try:
+            new_frame = self.broadcaster.tick()
+        finally:
+            utilization = self.broadcast_utilization() if self.broadcast_utilization is not None else None
+            period = self.broadcast_controller.update(new_frame, self.broadcaster.latency(), utilization)
+            self.io_loop.call_later(period, self._adaptive_broadcast)
         
     def create_web_server(self):
+        from tornado.httpserver import HTTPServer
+        from tornado.wsgi import WSGIContainer
+        from bokeh.util.browser import view # utility to Open a browser to view the specified location.
         # Create the web server using tornado (separate from Bokeh server)
         print('Opening Flask app with embedded Bokeh application on http://localhost:8080/')
         http_server = HTTPServer(WSGIContainer(self.flask_app)) # A non-blocking, single-threaded HTTP server. serves the WSGI app that flask provides. WSGI was created as a low-level interface between web servers and web applications or frameworks to promote common ground for portable web application development
@@ -54,3 +126,29 @@ class pysdr_app:
         
     def start_web_server(self):
         self.io_loop.start() # starts ioloop, and is blocking
+
+    # the headless version of start_web_server(), blocking.  every period seconds it sends each frame the DSP wrote to
+    #   the channel since last time (so every PSD/waterfall row, plus the metrics in them) to each sink, e.g.
+    #       myapp.run_headless(dsp_channel, [pysdr.frame_file_sink('monitor.frames'), pysdr.frame_zmq_sink('tcp://*:5555')])
+    #   duration (seconds) is mostly for tests, by default it runs until interrupted
+    def run_headless(self, channel, sinks, period=0.15, duration=None):
+        last_frame_id = None # frames written before we started aren't missed ones
+        self.skipped_frames = 0 # frames the DSP overwrote before we got to them (make period shorter, or num_slots bigger)
+        start = time.time()
+        try:
+            while duration is None or time.time() - start < duration:
+                for frame_id, frame in channel.read_since(last_frame_id or 0, copy=True): # copies, since sinks may hang onto them (e.g. zmq sends asynchronously)
+                    timestamp = channel.timestamp(frame_id) # when the DSP wrote it
+                    if timestamp is None:
+                        continue # rewritten since we copied it, counts as skipped
+                    if last_frame_id is not None:
+                        self.skipped_frames += frame_id - last_frame_id - 1
+                    last_frame_id = frame_id
+                    for sink in sinks:
+                        sink.write(frame_id, timestamp, frame)
+                time.sleep(period)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            for sink in sinks:
+                sink.close()
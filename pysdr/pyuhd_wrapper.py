@@ -3,6 +3,10 @@ from __future__ import print_function # allows python3 print() to work in python
 from uhd import libpyuhd
 import numpy as np
 import sys
+import time
+
+from pysdr.commands import command_channel
+from pysdr import tracing
 
 # --- install pyuhd as follows --- 
 # git clone https://github.com/EttusResearch/uhd.git
@@ -15,8 +19,11 @@ import sys
 
 # Even though pyuhd is a wrapper for UHD, our wrapper of a wrapper makes it a bit easier to use and i havent seen a performance loss
 class usrp_source(libpyuhd.usrp.multi_usrp):
-    def __init__(self, usrp_args=''):
+    def __init__(self, usrp_args='', commands=None):
         super(usrp_source, self).__init__(usrp_args)
+        self.commands = commands if commands is not None else command_channel() # lets other threads/processes retune without stopping the stream
+        self.tags = [] # (sample_index, key, value) for the most recent batch, see commands.settle_gate
+        self.pending_tags = [] # (time in seconds, key, value) for commands that haven't shown up in a batch yet
     
     def set_samp_rate(self, samp_rate):
         self.set_rx_rate(samp_rate, 0)
@@ -43,12 +50,58 @@ class usrp_source(libpyuhd.usrp.multi_usrp):
         stream_cmd.stream_now = True
         self.streamer.issue_stream_cmd(stream_cmd)
         
+    # applies whatever is waiting in the command channel, between packets.  UHD timed commands are used
+    #   so the change lands at a known radio time, which is what lets us tag the exact first sample after it
+    def apply_commands(self):
+        for key, value, delay in self.commands.get_pending():
+            command_time = self.get_time_now().get_real_secs() + (delay if delay is not None else 0.0)
+            if delay is not None:
+                self.set_command_time(libpyuhd.types.time_spec(command_time), 0)
+            if key == 'center_freq':
+                self.set_center_freq(value)
+            elif key == 'gain':
+                self.set_gain(value)
+            if delay is not None:
+                self.clear_command_time(0)
+            self.pending_tags.append((command_time, key, value))
+
+    # turns pending (time, key, value) into (sample_index, key, value) tags for the batch that just arrived.  an empty
+    #   or failed recv() leaves time_spec stale (or zero), so the tags wait for the next good batch
+    def update_tags(self, num_samps):
+        self.tags = []
+        if not self.pending_tags or num_samps <= 0 or self.metadata.error_code != libpyuhd.types.rx_metadata_error_code.none:
+            return
+        batch_start = self.metadata.time_spec.get_real_secs()
+        samp_rate = self.get_rx_rate(0)
+        still_pending = []
+        for command_time, key, value in self.pending_tags:
+            sample_index = int(round((command_time - batch_start) * samp_rate))
+            if sample_index < num_samps:
+                self.tags.append((max(sample_index, 0), key, value))
+            else:
+                still_pending.append((command_time, key, value))
+        self.pending_tags = still_pending
+
     def recv(self):
+        self.apply_commands()
+        start = time.perf_counter_ns()
         num_samps = self.streamer.recv(self.recv_buffer, self.metadata) # receive samples! returns number of samples
+        if tracing.enabled:
+            tracing.record('recv', start, time.perf_counter_ns() - start, num_samps)
         #if num_samps == 0:
         #    print("APPARENTLY ITS NOT A BLOCKING FUNCTION!")
         # check if there were any errors        
         if self.metadata.error_code != libpyuhd.types.rx_metadata_error_code.none:
+            if self.metadata.error_code == libpyuhd.types.rx_metadata_error_code.overflow:
+                tracing.mark_overflow() # dumps the trace leading up to it, if pysdr.tracing is set up to
             print(self.metadata.strerror())
+        self.update_tags(num_samps)
         # return the samples
         return self.recv_buffer
+
+    # stops streaming and drains whatever is still in flight, so the USRP can be deleted/reopened cleanly
+    #   (instead of having to receive a bunch more packets before del usrp)
+    def stop(self):
+        self.streamer.issue_stream_cmd(libpyuhd.types.stream_cmd(libpyuhd.types.stream_mode.stop_cont))
+        while self.streamer.recv(self.recv_buffer, self.metadata, 0.1) > 0: # 0.1 second timeout
+            pass
@@ -0,0 +1,228 @@
+from __future__ import print_function # allows python3 print() to work in python2
+
+import threading
+import numpy as np
+import pyqtgraph as pg
+from pyqtgraph.Qt import QtCore, QtGui
+
+from pysdr import colormap, histograms
+
+# pyqtgraph sinks that are safe to feed from the receive/DSP thread.  Qt widgets may only be touched from the GUI
+#   thread, so the DSP side just publish()es into a latest-value slot (never blocks, and a newer value replaces one
+#   that hasn't been drawn yet), and a QTimer on the GUI thread renders whatever is newest.  So rendering can never
+#   slow down acquisition, and frames the screen can't keep up with are simply skipped.
+#   e.g.
+#       freq = pysdr.qtgui.freq_sink(fft_size, samp_rate, center_freq)
+#       waterfall = pysdr.qtgui.waterfall_sink(fft_size, 200, samp_rate, center_freq)
+#       layout.addWidget(freq) ...
+#       timer = pysdr.qtgui.render_timer([freq, waterfall], fps=30) # create it on the GUI thread
+#       ...
+#       freq.publish(PSD) # from the DSP thread
+#       waterfall.publish(PSD)
+
+
+# holds the newest value published, take() hands it over once
+class latest_slot:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.value = None
+        self.published = 0
+        self.dropped = 0 # values that got replaced before anyone took them
+
+    def publish(self, value):
+        with self.lock:
+            if self.value is not None:
+                self.dropped += 1
+            self.value = value
+            self.published += 1
+
+    def take(self):
+        with self.lock:
+            value = self.value
+            self.value = None
+            return value
+
+
+# I and Q versus time, publish() a batch of samples (only the first num_points get drawn)
+class time_sink(pg.PlotWidget):
+    def __init__(self, num_points, samp_rate):
+        super(time_sink, self).__init__(labels={'left': 'Amplitude', 'bottom': 'Time [microseconds]'}, enableMenu=False)
+        self.getPlotItem().getViewBox().setMouseMode(pg.ViewBox.RectMode)
+        self.setMouseEnabled(x=False, y=True)
+        self.num_points = num_points
+        self.t = np.arange(num_points) / samp_rate * 1e6
+        self.curve_i = self.plot([])
+        self.curve_q = self.plot([], pen='r')
+        self.slot = latest_slot()
+        self.ranged = False # autoRange() once the first data is in, after that the user's zoom is left alone
+
+    def publish(self, samples):
+        self.slot.publish(np.array(samples[:self.num_points])) # copy, sources reuse their buffers
+
+    def render(self):
+        samples = self.slot.take()
+        if samples is None:
+            return
+        self.curve_i.setData(self.t[:len(samples)], samples.real)
+        self.curve_q.setData(self.t[:len(samples)], samples.imag)
+        if not self.ranged:
+            self.ranged = True
+            self.autoRange()
+
+
+# PSD in dB, publish() fft_size values (fftshifted)
+class freq_sink(pg.PlotWidget):
+    def __init__(self, fft_size, samp_rate, center_freq=0.0):
+        super(freq_sink, self).__init__(labels={'left': 'PSD [dB]', 'bottom': 'Frequency [MHz]'}, enableMenu=False)
+        self.getPlotItem().getViewBox().setMouseMode(pg.ViewBox.RectMode)
+        self.setMouseEnabled(x=False, y=True)
+        self.fft_size = fft_size
+        self.curve = self.plot([])
+        self.slot = latest_slot()
+        self.ranged = False
+        self.set_center_freq(samp_rate, center_freq)
+
+    def set_center_freq(self, samp_rate, center_freq):
+        self.f = (np.linspace(-samp_rate/2.0, samp_rate/2.0, self.fft_size) + center_freq) / 1e6
+
+    def publish(self, psd):
+        self.slot.publish(np.array(psd))
+
+    def render(self):
+        psd = self.slot.take()
+        if psd is not None:
+            self.curve.setData(self.f, psd)
+            if not self.ranged:
+                self.ranged = True
+                self.autoRange()
+
+
+# Waterfall drawn with an ImageItem and a fixed lookup table, rows are quantized to uint8 once when they arrive
+#   (floor/ceiling in dB, or auto_levels, see pysdr.colormap.waterfall_renderer), so a redraw is just a blit.  Unlike
+#   the other sinks every published row is kept, up to num_rows of them between renders, so the waterfall doesn't
+#   skip rows when the display is slower than the DSP
+class waterfall_sink(pg.PlotWidget):
+    def __init__(self, fft_size, num_rows, samp_rate, center_freq=0.0, row_duration=None, floor=-100.0, ceiling=0.0, palette='jet', auto_levels=False):
+        super(waterfall_sink, self).__init__(labels={'bottom': 'Frequency [MHz]'}, enableMenu=False)
+        self.setMouseEnabled(x=False, y=False)
+        self.fft_size = fft_size
+        self.num_rows = num_rows
+        self.renderer = colormap.waterfall_renderer(fft_size, num_rows, floor, ceiling, palette, auto_levels)
+        self.image_item = pg.ImageItem(axisOrder='row-major')
+        self.image_item.setLookupTable(self.renderer.lut) # preallocated once, not per redraw
+        self.addItem(self.image_item)
+        self.lock = threading.Lock()
+        self.pending = [] # rows published since the last render
+        self.samp_rate = samp_rate
+        self.center_freq = center_freq
+        self.row_duration = row_duration
+        self.axes_changed = False
+        self.set_axes(samp_rate, center_freq, row_duration)
+
+    # GUI thread only, use set_row_duration() from the DSP thread
+    def set_axes(self, samp_rate, center_freq, row_duration=None):
+        transform = QtGui.QTransform()
+        transform.translate((center_freq - samp_rate/2.0) / 1e6, 0)
+        transform.scale(samp_rate / self.fft_size / 1e6, row_duration if row_duration else 1.0)
+        self.image_item.setTransform(transform)
+        self.setLabel('left', 'Time [s]' if row_duration else 'Rows')
+
+    # can be called from any thread, e.g. once the DSP knows how much time each row represents
+    def set_row_duration(self, row_duration):
+        self.row_duration = row_duration
+        self.axes_changed = True
+
+    def publish(self, psd):
+        row = self.renderer.quantize(psd)[0] # on the publishing thread, so is the auto_levels state
+        with self.lock:
+            self.pending.append(row)
+            del self.pending[:-self.num_rows] # older ones would scroll off before they were ever drawn
+
+    def render(self):
+        with self.lock:
+            rows, self.pending = self.pending, []
+        if not rows:
+            return
+        self.renderer.push(rows)
+        self.image_item.setImage(self.renderer.image(), autoLevels=False, levels=(0, 255)) # oldest first, so the newest row ends up on top
+        if self.axes_changed or self.renderer.rows_added == len(rows): # new axes, or the first rows ever
+            self.axes_changed = False
+            self.set_axes(self.samp_rate, self.center_freq, self.row_duration)
+            self.autoRange()
+
+
+# IQ scatter of the first num_points samples of each batch
+class constellation_sink(pg.PlotWidget):
+    def __init__(self, num_points=500):
+        super(constellation_sink, self).__init__(labels={'left': 'Q', 'bottom': 'I'}, enableMenu=False)
+        self.num_points = num_points
+        self.scatter = self.plot([], pen=None, symbol='o', symbolSize=3, symbolPen=None, symbolBrush=(0, 255, 255, 128))
+        self.slot = latest_slot()
+
+    def publish(self, samples):
+        self.slot.publish(np.array(samples[:self.num_points]))
+
+    def render(self):
+        samples = self.slot.take()
+        if samples is not None:
+            self.scatter.setData(samples.real, samples.imag)
+
+
+# Draws a pysdr.histograms histogram as an image.  Every published sample goes into the histogram on the publishing
+#   thread (it's one bincount), and the GUI thread only ever draws a fixed size image
+class density_sink(pg.PlotWidget):
+    def __init__(self, histogram, x_range, y_range, labels, dynamic_range=40.0, palette='viridis'):
+        super(density_sink, self).__init__(labels=labels, enableMenu=False)
+        self.setMouseEnabled(x=False, y=False)
+        self.histogram = histogram
+        self.dynamic_range = dynamic_range
+        self.image_item = pg.ImageItem(axisOrder='row-major')
+        self.image_item.setLookupTable(colormap.lut(palette))
+        num_rows, num_columns = histogram.image.shape
+        transform = QtGui.QTransform()
+        transform.translate(x_range[0], y_range[0])
+        transform.scale((x_range[1] - x_range[0]) / float(num_columns), (y_range[1] - y_range[0]) / float(num_rows))
+        self.image_item.setTransform(transform)
+        self.addItem(self.image_item)
+        self.slot = latest_slot()
+
+    def publish(self, samples):
+        self.histogram.add(samples)
+        self.slot.publish(self.histogram.to_uint8(self.dynamic_range)) # a new array each time, so the GUI never sees a half written one
+
+    def render(self):
+        image = self.slot.take()
+        if image is not None:
+            self.image_item.setImage(image, autoLevels=False, levels=(0, 255))
+
+
+# IQ density instead of a scatter
+class constellation_density_sink(density_sink):
+    def __init__(self, num_bins=128, max_amplitude=1.0, decay=0.8, dynamic_range=40.0, palette='viridis'):
+        histogram = histograms.constellation_histogram(num_bins, max_amplitude, decay)
+        super(constellation_density_sink, self).__init__(histogram, (-max_amplitude, max_amplitude), (-max_amplitude, max_amplitude),
+                                                         {'left': 'Q', 'bottom': 'I'}, dynamic_range, palette)
+
+
+# eye diagram, takes the same arguments as pysdr.eye_histogram, x axis is in symbols
+class eye_diagram_sink(density_sink):
+    def __init__(self, samples_per_symbol, dynamic_range=40.0, palette='viridis', **kwargs):
+        histogram = histograms.eye_histogram(samples_per_symbol, **kwargs)
+        super(eye_diagram_sink, self).__init__(histogram, (0, histogram.num_symbols), (histogram.min_amplitude, histogram.max_amplitude),
+                                               {'left': 'Amplitude', 'bottom': 'Symbols'}, dynamic_range, palette)
+
+
+# the one place where the sinks get drawn, on the GUI thread
+class render_timer:
+    def __init__(self, sinks, fps=30):
+        self.sinks = list(sinks)
+        self.timer = QtCore.QTimer()
+        self.timer.timeout.connect(self.render)
+        self.timer.start(int(1000 / fps))
+
+    def render(self):
+        for sink in self.sinks:
+            sink.render()
+
+    def stop(self):
+        self.timer.stop()
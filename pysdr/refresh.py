@@ -0,0 +1,57 @@
+from __future__ import print_function # allows python3 print() to work in python2
+
+import time
+
+# Picks the GUI refresh period instead of a hardcoded 150 ms.  Call update() after every refresh and wait the period
+#   it returns before the next one.  It speeds up (down to min_period) while there are new frames to show and the
+#   browser keeps up, and backs off (up to max_period) when frames are stale, when the browser is slow to acknowledge
+#   what it was sent, or when the DSP side is busy, so the CPU goes to DSP instead of redrawing the same thing.
+#   self.fps is the achieved rate of refreshes that actually showed something new
+class refresh_controller:
+    def __init__(self, min_period=0.05, max_period=1.0, period=0.15, utilization_limit=0.8, speedup=0.9, backoff=1.25):
+        self.min_period = min_period
+        self.max_period = max_period
+        self.period = period # [seconds]
+        self.utilization_limit = utilization_limit # above this DSP utilization the GUI backs off
+        self.speedup = speedup # multiplicative, applied when everything is keeping up
+        self.backoff = backoff
+        self.fps = 0.0
+        self.last_frame_time = None
+
+    # new_frame: whether this refresh had anything new to show
+    # ack_latency: [seconds] how long the browser takes to acknowledge a frame, None if unknown
+    # utilization: DSP utilization (processing time / real time), None if unknown
+    def update(self, new_frame, ack_latency=None, utilization=None):
+        now = time.perf_counter()
+        if new_frame:
+            if self.last_frame_time is not None:
+                self.fps += 0.1 * (1.0 / max(now - self.last_frame_time, 1e-6) - self.fps)
+            self.last_frame_time = now
+        if utilization is not None and utilization > self.utilization_limit:
+            self.period *= self.backoff # DSP needs the CPU more than we do
+        elif ack_latency is not None and ack_latency > self.period:
+            self.period = max(self.period * self.backoff, ack_latency) # no point sending faster than the browser can take it
+        elif not new_frame:
+            self.period *= self.backoff # nothing new to draw, check less often
+        else:
+            self.period *= self.speedup
+        self.period = min(self.max_period, max(self.min_period, self.period))
+        return self.period
+
+
+##############
+# UNIT TESTS #
+##############
+if __name__ == '__main__': # (call this script directly to run tests)
+    controller = refresh_controller()
+    for i in range(50):
+        controller.update(True, ack_latency=0.01, utilization=0.3)
+    print("speed up test passed?", controller.period == controller.min_period)
+    for i in range(50):
+        controller.update(False)
+    print("stale test passed?", controller.period == controller.max_period)
+    controller.period = 0.1
+    controller.update(True, ack_latency=0.4)
+    print("slow client test passed?", controller.period == 0.4)
+    controller.update(True, utilization=0.95)
+    print("busy dsp test passed?", controller.period == 0.5)
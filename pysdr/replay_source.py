@@ -0,0 +1,164 @@
+from __future__ import print_function # allows python3 print() to work in python2
+
+import numpy as np
+
+from pysdr.commands import command_channel
+from pysdr.pacing import pacer
+from pysdr import tracing
+
+# Plays a recording back into a live app at its true sample rate, with the same interface as usrp_source, so field
+#   problems can be reproduced on a bench.  The file is memory mapped and handed out in radio-sized packets, paced on
+#   an absolute schedule (see pysdr.pacing) so there's no drift over a long recording.  speed=2.0 plays at twice the
+#   sample rate, loop=True starts over at the end, and realtime=False plays as fast as possible.
+#   If the app can't keep up, the samples it would have missed are skipped, exactly like a radio overflow, and
+#   counted in self.overflows/self.dropped (and marked in pysdr.tracing), so you can see how much headroom you have.
+#       replay = pysdr.replay_source('fm_band.iq', samp_rate=2.4e6, dtype=np.uint8, loop=True)
+#       replay.prepare_to_rx()
+#       samples = replay.recv() # None once a non-looping file has run out
+#   dtype is the file's format: complex64, complex128, or uint8 for interleaved 8 bit IQ (e.g. rtl_sdr recordings)
+class replay_source:
+    def __init__(self, filename, samp_rate, dtype=np.complex64, packet_size=2040, loop=False, speed=1.0, realtime=True, max_lag=0.1, commands=None):
+        self.filename = filename
+        self.samp_rate = samp_rate
+        self.file_dtype = np.dtype(dtype)
+        self.packet_size = packet_size
+        self.loop = loop
+        self.speed = speed
+        self.realtime = realtime
+        self.max_lag = max_lag # [seconds] how far behind the app can fall before it counts as an overflow
+        self.commands = commands if commands is not None else command_channel() # so apps written for usrp_source still work
+        self.tags = []
+        self.center_freq = None
+        self.gain = None
+        self.position = 0 # next sample to play
+        self.done = False
+        self.overflows = 0
+        self.dropped = 0
+        self.max_lag_seen = 0.0 # worst lag behind the schedule so far [seconds]
+        self.pacer = None
+        if self.file_dtype == np.uint8:
+            self.file = np.memmap(filename, dtype=np.uint8, mode='r')
+            self.num_samples = len(self.file) // 2
+        else:
+            self.file = np.memmap(filename, dtype=self.file_dtype, mode='r')
+            self.num_samples = len(self.file)
+
+    def set_samp_rate(self, samp_rate):
+        self.samp_rate = samp_rate
+        if self.pacer is not None:
+            self.prepare_to_rx()
+
+    # the recording can't be retuned, these just keep apps written for usrp_source happy
+    def set_center_freq(self, center_freq):
+        self.center_freq = center_freq
+
+    def set_gain(self, gain):
+        self.gain = gain
+
+    def prepare_to_rx(self):
+        self.recv_buffer = np.zeros(self.packet_size, dtype=np.complex64 if self.file_dtype == np.uint8 else self.file_dtype)
+        self.pacer = pacer(self.samp_rate, self.speed, self.max_lag) if self.realtime else None
+
+    def recv(self):
+        for key, value, delay in self.commands.get_pending():
+            setattr(self, key, value)
+        if self.done:
+            return None
+        if self.pacer is not None:
+            self.max_lag_seen = max(self.max_lag_seen, self.pacer.lag())
+            dropped = self.pacer.wait(self.packet_size)
+            if dropped:
+                self.overflows += 1
+                self.dropped += dropped
+                self._advance(dropped)
+                tracing.mark_overflow()
+                if self.done:
+                    return None
+        n = min(self.packet_size, self.num_samples - self.position) if not self.loop else self.packet_size
+        self._read(self.position, n)
+        self._advance(n)
+        return self.recv_buffer[:n]
+
+    def stop(self):
+        self.pacer = None
+
+    def _advance(self, n):
+        self.position += n
+        if self.position >= self.num_samples:
+            if self.loop:
+                self.position %= self.num_samples
+            else:
+                self.done = True
+
+    # copies n samples starting at start into recv_buffer, wrapping around the end of the file if looping
+    def _read(self, start, n):
+        first = min(n, self.num_samples - start)
+        self._convert(start, first, 0)
+        while first < n: # wrapped (the loop handles files shorter than a packet)
+            chunk = min(n - first, self.num_samples)
+            self._convert(0, chunk, first)
+            first += chunk
+
+    def _convert(self, start, n, out_start):
+        out = self.recv_buffer[out_start:out_start + n]
+        if self.file_dtype == np.uint8:
+            uint8_iq_to_complex(self.file[2*start:2*(start + n)], out=out)
+        else:
+            out[:] = self.file[start:start + n]
+
+
+# interleaved 8 bit IQ (rtl_sdr recordings, the .iq files plot_from_file.py reads) to complex, Q comes first in these
+#   files.  out can be a preallocated (or a view of one) complex array of len(raw)//2
+def uint8_iq_to_complex(raw, dtype=np.complex64, out=None):
+    if out is None:
+        out = np.empty(len(raw) // 2, dtype=dtype)
+    out.real = (raw[1::2] - 127.5) / 256.0
+    out.imag = (raw[::2] - 127.5) / 256.0
+    return out
+
+
+##############
+# UNIT TESTS #
+##############
+if __name__ == '__main__': # (call this script directly to run tests)
+    import os
+    import tempfile
+    import time
+
+    filename = os.path.join(tempfile.mkdtemp(), 'test.iq')
+    x = (np.random.randn(10000) + 1j*np.random.randn(10000)).astype(np.complex64)
+    x.tofile(filename)
+
+    replay = replay_source(filename, 1e6, packet_size=3000, realtime=False)
+    replay.prepare_to_rx()
+    y = []
+    while True:
+        samples = replay.recv()
+        if samples is None:
+            break
+        y.append(samples.copy())
+    print("replay test passed?", np.array_equal(np.concatenate(y), x))
+
+    replay = replay_source(filename, 1e6, packet_size=3000, loop=True, realtime=False)
+    replay.prepare_to_rx()
+    y = np.concatenate([replay.recv().copy() for i in range(10)])
+    print("loop test passed?", np.array_equal(y, np.tile(x, 3)[:30000]))
+
+    raw = np.random.randint(0, 256, 2000).astype(np.uint8)
+    raw.tofile(filename)
+    replay = replay_source(filename, 1e6, dtype=np.uint8, packet_size=1000, realtime=False)
+    replay.prepare_to_rx()
+    expected = (raw[1::2] - 127.5)/256.0 + 1j*(raw[::2] - 127.5)/256.0
+    print("uint8 test passed?", np.allclose(replay.recv(), expected))
+
+    x.tofile(filename)
+    replay = replay_source(filename, 1e6, packet_size=1000, loop=True, speed=2.0, max_lag=0.005)
+    replay.prepare_to_rx()
+    start = time.perf_counter()
+    for i in range(50): # 50k samples at 2 MHz is 25 ms
+        replay.recv()
+    elapsed = time.perf_counter() - start
+    print("pacing test passed?", 0.024 < elapsed < 0.035 and replay.overflows == 0, "(took %.4f s)" % elapsed)
+    time.sleep(0.02) # app stalls
+    replay.recv()
+    print("overflow test passed?", replay.overflows == 1 and replay.dropped > 20000)
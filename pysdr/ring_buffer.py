@@ -0,0 +1,110 @@
+from __future__ import print_function # allows python3 print() to work in python2
+
+import numpy as np
+from numpy.lib.stride_tricks import as_strided
+
+# Single-producer/single-consumer ring buffer that hands out contiguous views of any length (up to max_read)
+#   without copying, even when the data wraps around the end.  It does this by mirroring the first max_read
+#   samples of the ring right after the end of it, so buf[r:r+n] is always the right data.
+#   The producer only ever touches write_count and the consumer only ever touches read_count, so one thread
+#   can write() while another reads, with no locks on the hot path (each count is a single int assignment
+#   under the GIL, and it only gets bumped after the data it covers is in place).
+class ring_buffer:
+    def __init__(self, capacity, max_read, dtype=np.complex64):
+        self.size = 1 << int(np.ceil(np.log2(max(capacity, max_read, 1)))) # power of two, so wrapping is just a mask
+        self.mask = self.size - 1
+        self.max_read = max_read
+        self.buffer = np.zeros(self.size + max_read, dtype=dtype) # the extra max_read at the end mirrors the start
+        self.write_count = 0 # total samples ever written (only the producer changes this)
+        self.read_count = 0 # total samples ever consumed (only the consumer changes this)
+        self.pending_consume = 0 # what the last read() handed out but hasn't released yet
+        self.overflows = 0 # samples that didn't fit and were dropped
+
+    def available(self):
+        return self.write_count - self.read_count - self.pending_consume
+
+    def free(self):
+        return self.size - (self.write_count - self.read_count)
+
+    # producer side. copies as many samples as fit and returns how many that was
+    def write(self, samples):
+        n = min(len(samples), self.free())
+        if n < len(samples):
+            self.overflows += len(samples) - n
+        w = self.write_count & self.mask
+        first = min(n, self.size - w) # part that goes before the end of the ring
+        self.buffer[w:w+first] = samples[:first]
+        self.buffer[:n-first] = samples[first:n] # part that wraps around to the start
+        # keep the mirror in sync with anything that landed in the first max_read samples
+        if w < self.max_read:
+            m = min(first, self.max_read - w)
+            self.buffer[self.size+w:self.size+w+m] = samples[:m]
+        if n > first:
+            m = min(n - first, self.max_read)
+            self.buffer[self.size:self.size+m] = samples[first:first+m]
+        self.write_count += n # publish, only after the data is in place
+        return n
+
+    # consumer side. view of n samples starting offset samples after the read position, without consuming them.
+    #   returns None if there aren't enough samples yet
+    def peek(self, n, offset=0):
+        if n > self.max_read:
+            raise ValueError("can't hand out %d contiguous samples, max_read is %d" % (n, self.max_read))
+        if offset + n > self.available():
+            return None
+        r = (self.read_count + self.pending_consume + offset) & self.mask
+        view = self.buffer[r:r+n]
+        view.flags.writeable = False # writing into it would skip the mirror
+        return view
+
+    def consume(self, n):
+        self.read_count += n
+
+    # view of the next n samples, then moves forward by hop (defaults to n, use hop < n for overlapping reads).
+    #   the view stays valid until the next read(), that's when the samples it covers are released to the producer
+    def read(self, n, hop=None):
+        self.consume(self.pending_consume)
+        self.pending_consume = 0
+        view = self.peek(n)
+        if view is not None:
+            self.pending_consume = n if hop is None else hop
+        return view
+
+    # every complete overlapping frame currently available, as a 2D (num_frames x frame_size) strided view with no copy.
+    #   moves forward by num_frames*hop, and like read() the view stays valid until the next read
+    def read_frames(self, frame_size, hop):
+        self.consume(self.pending_consume)
+        self.pending_consume = 0
+        span = min(self.available(), self.max_read)
+        if span < frame_size:
+            return self.buffer[:0].reshape(0, frame_size)
+        num_frames = (span - frame_size) // hop + 1
+        view = self.peek(frame_size + (num_frames - 1) * hop)
+        self.pending_consume = num_frames * hop
+        return as_strided(view, shape=(num_frames, frame_size), strides=(hop * view.strides[0], view.strides[0]), writeable=False)
+
+
+##############
+# UNIT TESTS #
+##############
+if __name__ == '__main__': # (call this script directly to run tests)
+    x = np.arange(100000).astype(np.complex64) # signal, sample value == sample index makes checking easy
+
+    # stream it through in random sized batches, reading overlapping blocks of 1000 with a hop of 300
+    ring = ring_buffer(4096, 1000)
+    i = 0
+    starts = []
+    passed = True
+    while i < len(x):
+        i += ring.write(x[i:i+np.random.randint(1, 3000)])
+        while True:
+            block = ring.read(1000, hop=300)
+            if block is None:
+                break
+            passed &= np.array_equal(block, np.arange(block[0].real, block[0].real + 1000))
+            starts.append(int(block[0].real))
+    print("ring_buffer test passed?", passed and starts == list(range(0, starts[-1] + 1, 300)) and ring.overflows == 0)
+
+    ring = ring_buffer(16, 8)
+    ring.write(x[:20])
+    print("overflow test passed?", ring.overflows == 4 and ring.available() == 16)
@@ -0,0 +1,187 @@
+from __future__ import print_function # allows python3 print() to work in python2
+
+import time
+import numpy as np
+from multiprocessing import shared_memory
+
+# Shared-memory channel for getting DSP results (PSD, waterfall rows, I/Q, utilization) from the DSP process
+#   to the GUI process, replacing multiprocessing.Manager().dict() which runs a proxy server process and
+#   pickles whole arrays on every read and write.  Here nothing gets pickled and there is no extra process.
+#
+# Layout (fixed at creation):  [header: write_count, seq of each slot, timestamp of each slot] [slot 0: field, field, ...] [slot 1] ...
+#   The writer fills the next slot of the ring and then bumps write_count, so the GUI can always read the
+#   latest complete frame while the next one is being written.  Each slot has a seqlock-style sequence number,
+#   odd while it's being written and 2*frame_id once complete, so readers can tell if they raced the writer.
+#   end_write() also stamps the slot with time.time(), so consumers know when the DSP produced it, not when they read it.
+#   Only one process should write, any number can read.  Pass the channel to the Process like any other arg.
+#
+# e.g.  channel = shared_channel({'psd': (fft_size, np.float32), 'i': (500, np.float32), 'utilization': (1, np.float32)})
+
+alignment = 64 # start each field on a cache line
+
+
+class shared_channel:
+    def __init__(self, fields, num_slots=4, name=None, create=True):
+        self.fields = [(key, (shape,) if np.isscalar(shape) else tuple(shape), np.dtype(dtype)) for key, (shape, dtype) in sorted(fields.items())]
+        self.num_slots = num_slots
+        # figure out where each field lives within a slot
+        self.offsets = {}
+        slot_size = 0
+        for key, shape, dtype in self.fields:
+            self.offsets[key] = slot_size
+            slot_size += -(-int(np.prod(shape)) * dtype.itemsize // alignment) * alignment # round up to alignment
+        self.slot_size = slot_size
+        header_size = -(-(1 + 2 * num_slots) * 8 // alignment) * alignment
+        total_size = header_size + num_slots * slot_size
+        if create:
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=total_size)
+        else:
+            self.shm = _attach(name)
+        self.owner = create # the process that created it is the one that unlinks it
+        self.header = np.ndarray(1 + num_slots, dtype=np.uint64, buffer=self.shm.buf)
+        self.seqs = self.header[1:]
+        self.timestamps = np.ndarray(num_slots, dtype=np.float64, buffer=self.shm.buf, offset=(1 + num_slots) * 8)
+        if create:
+            self.header[:] = 0
+            self.timestamps[:] = 0.0
+        # numpy views of every field in every slot, so reads and writes are just slicing
+        self.slots = []
+        for slot in range(num_slots):
+            views = {}
+            for key, shape, dtype in self.fields:
+                offset = header_size + slot * slot_size + self.offsets[key]
+                views[key] = np.ndarray(shape, dtype=dtype, buffer=self.shm.buf, offset=offset)
+            self.slots.append(views)
+        self.writing = None # frame_id currently being written by begin_write()
+
+    # lets the channel be passed to a multiprocessing.Process (or through a Queue), the other side just re-attaches by name
+    def __reduce__(self):
+        fields = dict((key, (shape, dtype.str)) for key, shape, dtype in self.fields)
+        return (shared_channel, (fields, self.num_slots, self.shm.name, False))
+
+    def frame_count(self):
+        return int(self.header[0])
+
+    # returns a dict of writable views into the next slot, fill them in place and then call end_write()
+    def begin_write(self):
+        frame_id = self.frame_count() + 1
+        slot = frame_id % self.num_slots
+        self.seqs[slot] = 2 * frame_id - 1 # odd means a write is in progress
+        self.writing = frame_id
+        return self.slots[slot]
+
+    def end_write(self):
+        frame_id = self.writing
+        self.timestamps[frame_id % self.num_slots] = time.time()
+        self.seqs[frame_id % self.num_slots] = 2 * frame_id
+        self.header[0] = frame_id # publish it
+        self.writing = None
+
+    # convenience version of begin/end_write, any field not given keeps the value from the previous frame
+    def write(self, **arrays):
+        previous = self.slots[self.frame_count() % self.num_slots]
+        frame = self.begin_write()
+        for key, view in frame.items():
+            if key in arrays:
+                view[...] = arrays[key]
+            else:
+                view[...] = previous[key]
+        self.end_write()
+
+    # returns (frame_id, dict of arrays) for the latest complete frame, or (0, None) if nothing was written yet.
+    #   copy=False hands out views straight into shared memory (zero-copy), they stay good until the writer
+    #   wraps around the ring, which you can check afterwards with still_valid(frame_id)
+    def read(self, copy=False):
+        while True:
+            frame_id = self.frame_count()
+            if frame_id == 0:
+                return 0, None
+            frame = self._read_frame(frame_id, copy)
+            if frame is not None:
+                return frame_id, frame
+
+    # returns a list of (frame_id, dict of arrays) for every frame newer than last_frame_id that is still in the ring,
+    #   oldest first, e.g. to append every new waterfall row even if the GUI refreshes slower than the DSP
+    def read_since(self, last_frame_id, copy=False):
+        frames = []
+        newest = self.frame_count()
+        for frame_id in range(max(last_frame_id + 1, newest - self.num_slots + 2, 1), newest + 1): # the oldest slot could be getting rewritten
+            frame = self._read_frame(frame_id, copy)
+            if frame is not None:
+                frames.append((frame_id, frame))
+        return frames
+
+    def still_valid(self, frame_id):
+        return int(self.seqs[frame_id % self.num_slots]) == 2 * frame_id
+
+    # time.time() when the DSP finished writing frame_id, or None if that slot has been rewritten since
+    def timestamp(self, frame_id):
+        timestamp = float(self.timestamps[frame_id % self.num_slots])
+        return timestamp if self.still_valid(frame_id) else None
+
+    def _read_frame(self, frame_id, copy):
+        slot = frame_id % self.num_slots
+        if int(self.seqs[slot]) != 2 * frame_id: # being written, or already overwritten by a newer frame
+            return None
+        if not copy:
+            return self.slots[slot]
+        frame = dict((key, view.copy()) for key, view in self.slots[slot].items())
+        if int(self.seqs[slot]) != 2 * frame_id: # the writer got to it while we were copying
+            return None
+        return frame
+
+    def close(self):
+        self.header = self.seqs = self.timestamps = self.slots = None # views have to go before the memory can be closed
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+# attaches to an existing block without making this process responsible for it (only the creator unlinks it).
+#   python < 3.13 doesn't have track=False, but there the registration is harmless for our use, because child
+#   processes share the parent's resource tracker and it only cleans up what's left once they have all exited
+def _attach(name):
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        return shared_memory.SharedMemory(name=name)
+
+
+##############
+# UNIT TESTS #
+##############
+if __name__ == '__main__': # (call this script directly to run tests)
+    from multiprocessing import Process
+    import pickle
+
+    channel = shared_channel({'psd': (512, np.float32), 'waterfall_row': (512, np.float32), 'utilization': (1, np.float32)}, num_slots=4)
+    print("empty channel test passed?", channel.read() == (0, None))
+
+    # write from another process, like the DSP process would
+    def dsp_process(channel):
+        for i in range(10):
+            frame = channel.begin_write()
+            frame['psd'][:] = i
+            frame['waterfall_row'][:] = -i
+            frame['utilization'][0] = 0.5
+            channel.end_write()
+    p = Process(target=dsp_process, args=(channel,))
+    p.start()
+    p.join()
+
+    before = time.time()
+    frame_id, frame = channel.read()
+    print("latest frame test passed?", frame_id == 10 and np.all(frame['psd'] == 9) and channel.still_valid(frame_id))
+    rows = channel.read_since(5, copy=True)
+    print("read_since test passed?", [r[0] for r in rows] == [8, 9, 10] and np.all(rows[0][1]['waterfall_row'] == -7))
+
+    channel.write(psd=np.ones(512)) # fields not given carry over
+    frame_id, frame = channel.read(copy=True)
+    print("partial write test passed?", frame_id == 11 and np.all(frame['psd'] == 1) and np.all(frame['waterfall_row'] == -9))
+    print("stale frame test passed?", not channel.still_valid(7))
+    print("timestamp test passed?", channel.timestamp(10) <= before <= channel.timestamp(11) <= time.time() and channel.timestamp(7) is None)
+
+    attached = pickle.loads(pickle.dumps(channel)) # what happens when it gets sent to another process
+    print("attach test passed?", attached.read(copy=True)[0] == 11)
+    attached.close()
+    channel.close()
@@ -0,0 +1,203 @@
+from __future__ import print_function # allows python3 print() to work in python2
+
+import numpy as np
+
+from pysdr.commands import command_channel
+from pysdr.pacing import pacer
+from pysdr import tracing
+
+# Simulated radio with the same interface as usrp_source, so apps can be developed, benchmarked and soak-tested
+#   without any hardware.  Everything is precomputed: the tones and bursts go into one periodic table (tone
+#   frequencies get snapped to a multiple of samp_rate/table_size so the table loops without a glitch), and the noise
+#   comes from a cached block read at a random offset each packet.  So making a packet is two slices, an add and a
+#   scale by the gain.  A retune only rebuilds the signal table from the cached burst basebands, and a gain change
+#   only changes the scale, so neither stalls the stream (the noise cache never needs rebuilding).
+#       sim = pysdr.sim_source(samp_rate=1e6, center_freq=100e6)
+#       sim.add_tone(100.1e6, power_db=-20)
+#       sim.add_burst(99.8e6, 'fsk', period=0.05)
+#       sim.prepare_to_rx()
+#       samples = sim.recv()
+#   realtime=True paces packets at the sample rate (times speed), realtime=False returns them as fast as possible.
+#   overflow_probability injects overflows (a packet's worth of samples goes missing), and a consumer that falls
+#   behind the pace causes them too, just like the real thing.  Retunes/gain changes arrive through the same
+#   command_channel as usrp_source and get tagged on the first sample generated after them
+class sim_source:
+    def __init__(self, samp_rate=1e6, center_freq=100e6, gain=0.0, packet_size=2040, realtime=True, speed=1.0,
+                 noise_power_db=-60.0, overflow_probability=0.0, table_size=2**18, commands=None, seed=None):
+        self.samp_rate = samp_rate
+        self.center_freq = center_freq
+        self.gain = gain
+        self.packet_size = packet_size
+        self.realtime = realtime
+        self.speed = speed
+        self.noise_power_db = noise_power_db
+        self.overflow_probability = overflow_probability
+        self.table_size = table_size
+        self.commands = commands if commands is not None else command_channel()
+        self.random = np.random.RandomState(seed)
+        self.signals = [] # (kind, freq, power_db, options)
+        self.tags = []
+        self.overflows = 0 # injected ones plus the ones caused by falling behind the pace
+        self.sample_count = 0 # samples "received" so far, including the ones lost to overflows
+        self.pacer = None
+        self.table = None # signals at 0 dB gain, depends on center_freq and samp_rate
+        self.basebands = [] # per signal, the burst envelope over the whole table (None for a tone), doesn't depend on tuning
+        self.noise = None # unit variance, scaled by noise_power_db and gain in recv()
+        self.unit_circle = None
+
+    def set_samp_rate(self, samp_rate):
+        self.samp_rate = samp_rate
+        self.table = None # rebuilt on the next recv
+        self.basebands = [] # burst timing is in samples, so these change too
+
+    def set_center_freq(self, center_freq):
+        self.center_freq = center_freq
+        self.table = None
+
+    def set_gain(self, gain):
+        self.gain = gain # applied as a scale factor, nothing to rebuild
+
+    def add_tone(self, freq, power_db=0.0):
+        self.signals.append(('tone', freq, power_db, {}))
+        self.table = None
+
+    # a burst of OOK, 2-FSK, or FM (a tone modulating the carrier) every period seconds, lasting duration seconds
+    def add_burst(self, freq, kind='ook', power_db=0.0, duration=0.01, period=0.1, symbol_rate=10e3, deviation=20e3, tone_freq=1e3):
+        if kind not in ('ook', 'fsk', 'fm'):
+            raise ValueError("burst kind has to be 'ook', 'fsk', or 'fm'")
+        self.signals.append((kind, freq, power_db, {'duration': duration, 'period': period, 'symbol_rate': symbol_rate, 'deviation': deviation, 'tone_freq': tone_freq}))
+        self.table = None
+
+    def prepare_to_rx(self):
+        self.recv_buffer = np.zeros(self.packet_size, dtype=np.complex64)
+        self.pacer = pacer(self.samp_rate, self.speed) if self.realtime else None
+        self._build_tables()
+
+    # same as usrp_source, except the change always lands at the start of the next packet
+    def apply_commands(self):
+        for key, value, delay in self.commands.get_pending():
+            if key == 'center_freq':
+                self.set_center_freq(value)
+            elif key == 'gain':
+                self.set_gain(value)
+            self.tags.append((0, key, value))
+
+    def recv(self):
+        self.tags = []
+        self.apply_commands()
+        if self.table is None:
+            self._build_tables()
+        dropped = 0
+        if self.random.random_sample() < self.overflow_probability:
+            dropped = self.packet_size
+            if self.pacer is not None:
+                self.pacer.wait(self.packet_size) # the lost packet still takes its time to arrive
+        if self.pacer is not None:
+            dropped += self.pacer.wait(self.packet_size)
+        if dropped:
+            self.overflows += 1
+            self.sample_count += dropped # the signal keeps going while the samples are lost
+            tracing.mark_overflow()
+        position = self.sample_count % self.table_size
+        offset = self.random.randint(0, len(self.noise) - self.packet_size)
+        np.multiply(self.noise[offset:offset + self.packet_size], self.noise_scale, out=self.recv_buffer)
+        self.recv_buffer += self.table[position:position + self.packet_size]
+        self.recv_buffer *= 10.0**(self.gain / 20.0)
+        self.sample_count += self.packet_size
+        return self.recv_buffer
+
+    def stop(self):
+        self.pacer = None
+
+    def _build_tables(self):
+        if self.noise is None:
+            noise_size = 4 * self.table_size
+            self.noise = ((self.random.randn(noise_size) + 1j*self.random.randn(noise_size)) / np.sqrt(2.0)).astype(np.complex64) # split between I and Q
+        self.noise_scale = np.float32(10.0**(self.noise_power_db / 20.0))
+        for kind, freq, power_db, options in self.signals[len(self.basebands):]: # only the signals added since last time
+            self.basebands.append(None if kind == 'tone' else self._burst(kind, options).astype(np.complex64))
+        if self.unit_circle is None: # one cycle, every carrier is this read with a stride
+            self.unit_circle = np.exp(2j * np.pi * np.arange(self.table_size) / self.table_size).astype(np.complex64)
+        n = np.arange(self.table_size)
+        table = np.zeros(self.table_size + self.packet_size, dtype=np.complex64)
+        body = table[:self.table_size]
+        for (kind, freq, power_db, options), baseband in zip(self.signals, self.basebands):
+            # snap to a whole number of cycles per table, so it wraps around without a phase jump
+            cycles = int(np.round((freq - self.center_freq) / self.samp_rate * self.table_size))
+            carrier = self.unit_circle[(cycles * n) % self.table_size]
+            carrier *= np.float32(10.0**(power_db / 20.0))
+            if baseband is not None:
+                carrier *= baseband
+            body += carrier
+        # the extra packet_size at the end is the start of the table again, so every packet is one contiguous slice
+        table[self.table_size:] = body[:self.packet_size]
+        self.table = table
+
+    # baseband of one burst kind over the whole table, zero between bursts
+    def _burst(self, kind, options):
+        bursts_per_table = max(1, int(round(self.table_size / (options['period'] * self.samp_rate))))
+        spacing = self.table_size // bursts_per_table
+        length = min(spacing, int(options['duration'] * self.samp_rate))
+        t = np.arange(length) / float(self.samp_rate)
+        samples_per_symbol = max(1, int(self.samp_rate / options['symbol_rate']))
+        out = np.zeros(self.table_size, dtype=np.complex128)
+        for i in range(bursts_per_table):
+            bits = np.repeat(self.random.randint(0, 2, length // samples_per_symbol + 1), samples_per_symbol)[:length]
+            if kind == 'ook':
+                burst = bits.astype(np.complex128)
+            elif kind == 'fsk':
+                burst = np.exp(2j * np.pi * np.cumsum((2 * bits - 1) * options['deviation']) / self.samp_rate)
+            else: # fm
+                burst = np.exp(1j * options['deviation'] / options['tone_freq'] * np.sin(2 * np.pi * options['tone_freq'] * t))
+            out[i * spacing:i * spacing + length] = burst
+        return out
+
+
+##############
+# UNIT TESTS #
+##############
+if __name__ == '__main__': # (call this script directly to run tests)
+    import time
+
+    sim = sim_source(samp_rate=1e6, center_freq=100e6, packet_size=1000, realtime=False, seed=0)
+    sim.add_tone(100.25e6, power_db=-10)
+    sim.prepare_to_rx()
+    x = np.concatenate([sim.recv().copy() for i in range(64)])
+    PSD = np.abs(np.fft.fftshift(np.fft.fft(x[:4096])))**2
+    print("tone test passed?", np.argmax(PSD) == 4096//2 + 1024)
+    tone = np.exp(2j * np.pi * 0.25 * np.arange(len(x)))
+    print("continuity test passed?", np.abs(np.mean(x * np.conj(tone))) > 0.3) # no phase jumps at the table wrap
+
+    sim.add_burst(99.9e6, 'ook', duration=0.001, period=0.01)
+    sim.commands.set_gain(10)
+    time.sleep(0.01) # let the Queue's feeder thread deliver it
+    sim.recv()
+    print("command test passed?", sim.tags == [(0, 'gain', 10.0)] and sim.gain == 10.0)
+
+    sim2 = sim_source(samp_rate=1e6, packet_size=2000, realtime=True, overflow_probability=0.1, seed=1)
+    sim2.prepare_to_rx()
+    start = time.perf_counter()
+    for i in range(50):
+        sim2.recv()
+    elapsed = time.perf_counter() - start
+    print("realtime test passed?", 0.09 < elapsed < 0.25 and sim2.overflows > 0, "(took %.3f s, %d overflows)" % (elapsed, sim2.overflows))
+
+    # a retune or gain change mid-stream has to fit well inside the pacer's max_lag, or it would cause an overflow
+    sim3 = sim_source(samp_rate=10e6, center_freq=100e6, packet_size=2040, realtime=False, seed=2)
+    sim3.add_tone(101e6, power_db=-20)
+    sim3.add_burst(99e6, 'fsk')
+    sim3.prepare_to_rx()
+    sim3.recv()
+    noise = sim3.noise
+    sim3.commands.set_center_freq(100.5e6)
+    sim3.commands.set_gain(20)
+    time.sleep(0.01)
+    start = time.perf_counter()
+    sim3.recv()
+    retune_time = time.perf_counter() - start
+    sim3.commands.set_gain(30)
+    time.sleep(0.01)
+    start = time.perf_counter()
+    sim3.recv()
+    gain_time = time.perf_counter() - start
+    print("retune test passed?", sim3.noise is noise and retune_time < 0.05 and gain_time < 0.01, "(retune took %.1f ms, gain change %.1f ms)" % (retune_time * 1e3, gain_time * 1e3))
@@ -0,0 +1,37 @@
+from __future__ import print_function # allows python3 print() to work in python2
+
+import numpy as np
+
+from pysdr.framer import framer
+from pysdr.profiling import instrumented
+
+# streaming PSD (Welch style), averages every fft_size frame that completes in a batch and returns the result in dB,
+#   or None if the batch didn't complete a frame.  overlap is a fraction, e.g. 0.5 for 50% overlapping frames
+class psd:
+    def __init__(self, fft_size, overlap=0.0, window=None, dtype=np.complex64):
+        self.fft_size = fft_size
+        self.framer = framer(fft_size, max(1, int(fft_size * (1.0 - overlap))), dtype)
+        self.window = np.hanning(fft_size) if window is None else np.asarray(window)
+        self.scale = 1.0 / np.sum(self.window)**2 # so a full scale tone shows up at 0 dB
+
+    @instrumented
+    def psd(self, x):
+        frames = self.framer.frames(x)
+        if len(frames) == 0:
+            return None
+        spectrum = np.fft.fft(frames * self.window, axis=1) # all frames in one call
+        power = np.mean(spectrum.real**2 + spectrum.imag**2, axis=0) * self.scale
+        return 10.0 * np.log10(np.fft.fftshift(power) + 1e-20)
+
+
+##############
+# UNIT TESTS #
+##############
+if __name__ == '__main__': # (call this script directly to run tests)
+    fft_size = 512
+    n = np.arange(fft_size * 20)
+    x = np.exp(2j * np.pi * 0.25 * n).astype(np.complex64) # full scale tone at fs/4
+    psd1 = psd(fft_size, overlap=0.5)
+    print("no frame test passed?", psd1.psd(x[:100]) is None)
+    PSD = psd1.psd(x[100:])
+    print("psd test passed?", np.argmax(PSD) == fft_size//2 + fft_size//4 and abs(np.max(PSD)) < 0.01)
@@ -0,0 +1,175 @@
+from __future__ import print_function # allows python3 print() to work in python2
+
+import functools
+import itertools
+import json
+import os
+import threading
+import time
+import numpy as np
+
+# Timeline tracing, for when the waterfall stutters and you need to know if it was recv, an FFT, the Manager proxy,
+#   or the Bokeh callback.  Spans (thread, block, batch id, sample count, start, duration) go into a fixed-size
+#   in-memory ring, so it can be left running on a live pipeline, and dump() writes the last few seconds out as
+#   Chrome trace JSON that loads in chrome://tracing or https://ui.perfetto.dev
+#       pysdr.tracing.enable(dump_on_overflow_filename='overflow_trace.json')
+#   Instrumented pysdr blocks, the flowgraph stages, and usrp_source.recv record spans automatically,
+#   wrap anything else (e.g. plot_update) with pysdr.tracing.traced(plot_update).
+#   Off by default, and then it costs one global check per call
+
+enabled = False
+dump_on_overflow = None # filename to dump to when a source reports an overflow
+min_dump_interval = 1.0 # [seconds] so a burst of overflows doesn't turn into a burst of dumps
+
+_span_dtype = np.dtype([('seq', np.int64), ('start_ns', np.int64), ('dur_ns', np.int64), ('tid', np.int64), ('name', np.int32), ('batch', np.int64), ('samples', np.int64), ('instant', np.bool_)])
+_spans = np.zeros(0, dtype=_span_dtype)
+_counter = itertools.count() # next() is atomic under the GIL, so threads never get the same slot
+_names = [] # span names are stored as indices into this list
+_name_ids = {}
+_thread_names = {} # tid -> thread name, for the trace viewer's labels
+_local = threading.local() # per-thread batch id, set by the flowgraph
+_last_dump = 0.0
+_dump_thread = None # writes overflow dumps, so the receive thread never waits on JSON or the disk
+_epoch_ns = time.perf_counter_ns()
+
+
+def enable(capacity=65536, dump_on_overflow_filename=None):
+    global enabled, _spans, _counter, dump_on_overflow
+    _spans = np.zeros(capacity, dtype=_span_dtype)
+    _spans['seq'] = -1 # empty
+    _counter = itertools.count()
+    dump_on_overflow = dump_on_overflow_filename
+    enabled = True
+
+
+def disable():
+    global enabled
+    enabled = False
+
+
+# batch id for the spans this thread records from now on (-1 for none)
+def set_batch(batch_id):
+    _local.batch = batch_id
+
+
+def _name_id(name):
+    name_id = _name_ids.get(name)
+    if name_id is None:
+        name_id = _name_ids.setdefault(name, len(_names))
+        if name_id == len(_names):
+            _names.append(name)
+    return name_id
+
+
+def record(name, start_ns, dur_ns, samples=0, instant=False):
+    thread = threading.current_thread()
+    tid = thread.ident
+    if tid not in _thread_names:
+        _thread_names[tid] = thread.name
+    seq = next(_counter)
+    _spans[seq % len(_spans)] = (seq, start_ns, dur_ns, tid, _name_id(name), getattr(_local, 'batch', -1), samples, instant)
+
+
+# e.g. with pysdr.tracing.span('fft', len(samples)):
+class span:
+    def __init__(self, name, samples=0):
+        self.name = name
+        self.samples = samples
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+    def __exit__(self, *args):
+        if enabled:
+            record(self.name, self.start, time.perf_counter_ns() - self.start, self.samples)
+
+
+def traced(function, name=None):
+    span_name = name if name is not None else getattr(function, '__name__', 'function')
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        if not enabled:
+            return function(*args, **kwargs)
+        start = time.perf_counter_ns()
+        out = function(*args, **kwargs)
+        record(span_name, start, time.perf_counter_ns() - start, len(args[0]) if args and hasattr(args[0], '__len__') else 0)
+        return out
+    return wrapper
+
+
+# sources call this when they see an overflow, it shows up as an instant event and triggers a dump if asked to.
+#   it's called from the receive thread, so all it does there is copy the ring (a single memcpy), the JSON gets
+#   written by a background thread, and a dump that's still being written means no new one gets started
+def mark_overflow(name='overflow'):
+    global _last_dump, _dump_thread
+    if not enabled:
+        return
+    record(name, time.perf_counter_ns(), 0, instant=True)
+    if dump_on_overflow and time.time() - _last_dump > min_dump_interval and not (_dump_thread and _dump_thread.is_alive()):
+        _last_dump = time.time()
+        _dump_thread = threading.Thread(target=dump, args=(dump_on_overflow, _spans.copy()), name='trace_dump')
+        _dump_thread.daemon = True
+        _dump_thread.start()
+
+
+# snapshot is a copy of the ring to convert instead of the live one
+def events(snapshot=None):
+    spans = _spans if snapshot is None else snapshot
+    spans = spans[spans['seq'] >= 0]
+    spans = spans[np.argsort(spans['seq'])] # oldest first
+    pid = os.getpid()
+    trace = [{'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid, 'args': {'name': name}} for tid, name in list(_thread_names.items())]
+    for s in spans:
+        event = {'name': _names[s['name']],
+                 'ph': 'i' if s['instant'] else 'X', # instant event (overflows), or complete event
+                 'ts': (s['start_ns'] - _epoch_ns) / 1e3, # chrome trace wants microseconds
+                 'pid': pid,
+                 'tid': int(s['tid']),
+                 'args': {'batch': int(s['batch']), 'samples': int(s['samples'])}}
+        if s['instant']:
+            event['s'] = 'g' # drawn across the whole timeline
+        else:
+            event['dur'] = s['dur_ns'] / 1e3
+        trace.append(event)
+    return trace
+
+
+def dump(filename, snapshot=None):
+    with open(filename, 'w') as f:
+        json.dump({'traceEvents': events(snapshot), 'displayTimeUnit': 'ms'}, f)
+
+
+##############
+# UNIT TESTS #
+##############
+if __name__ == '__main__': # (call this script directly to run tests)
+    import tempfile
+    import pysdr.tracing as tracing # the blocks use the module, not this __main__ copy of it
+    from pysdr.filters import fir_filter
+
+    filter1 = fir_filter(np.random.rand(50))
+    x = np.random.randn(4096) + 1j*np.random.randn(4096)
+    filename = os.path.join(tempfile.mkdtemp(), 'trace.json')
+    tracing.enable(capacity=16, dump_on_overflow_filename=filename)
+    def worker():
+        for i in range(20): # more than the capacity, so the ring wraps
+            tracing.set_batch(i)
+            filter1.filter(x)
+    thread = threading.Thread(target=worker, name='dsp')
+    thread.start()
+    thread.join()
+    tracing.mark_overflow()
+    tracing._dump_thread.join() # written in the background
+    trace = json.load(open(filename))['traceEvents']
+    spans = [e for e in trace if e['ph'] == 'X']
+    print("tracing test passed?", len(spans) == 15 and spans[-1]['args']['batch'] == 19 and spans[0]['name'] == 'fir_filter')
+    print("thread name test passed?", any(e['ph'] == 'M' and e['args']['name'] == 'dsp' for e in trace))
+    print("overflow test passed?", trace[-1]['name'] == 'overflow' and trace[-1]['ph'] == 'i')
+    tracing.enable(capacity=65536, dump_on_overflow_filename=filename)
+    for i in range(65536):
+        tracing.record('fill', i, 1)
+    tracing._last_dump = 0.0
+    start = time.perf_counter()
+    tracing.mark_overflow()
+    elapsed = time.perf_counter() - start
+    tracing._dump_thread.join()
+    print("background dump test passed?", elapsed < 0.05 and len(json.load(open(filename))['traceEvents']) > 65536)
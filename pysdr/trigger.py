@@ -0,0 +1,140 @@
+from __future__ import print_function # allows python3 print() to work in python2
+
+import numpy as np
+
+from pysdr.ring_buffer import ring_buffer
+
+# Oscilloscope-style trigger for time sinks, so a repetitive or bursty signal sits still on the screen instead of
+#   jumping around with wherever the batch happened to start.  Feed it every batch of the stream (not just the ones
+#   the display gets) and it keeps the last pre_trigger samples in a ring buffer, so the capture can start before the
+#   trigger point, even in the previous batch.  The trigger condition is evaluated for the whole batch at once with
+#   numpy comparisons, the only Python-level loop is over the triggers that actually fire.
+#   modes:
+#       'edge'      - real part crosses level (going up for slope='rising', down for slope='falling')
+#       'level'     - real part is at or beyond level, fires again as soon as it's re-armed
+#       'magnitude' - |samples| crosses level, for bursts of a complex signal whatever their phase
+#   holdoff: [samples] after a trigger before it re-arms, it never re-arms before the capture is complete.  For a
+#       display, about one refresh period's worth (refresh period * samp_rate) is plenty, a shorter holdoff only
+#       means more captures that nobody sees
+#   e.g.
+#       trig = pysdr.trigger(num_points=500, pre_trigger=100, mode='magnitude', level=0.1, holdoff=10000)
+#       trig.process(samples) # every batch
+#       trig.latest # (num_points) complex samples of the most recent capture, trigger at index pre_trigger, or None
+class trigger:
+    def __init__(self, num_points, pre_trigger=0, mode='edge', level=0.0, slope='rising', holdoff=0):
+        if mode not in ('edge', 'level', 'magnitude'):
+            raise ValueError("mode has to be 'edge', 'level' or 'magnitude'")
+        if slope not in ('rising', 'falling'):
+            raise ValueError("slope has to be 'rising' or 'falling'")
+        if not 0 <= pre_trigger < num_points:
+            raise ValueError("pre_trigger has to be between 0 and num_points - 1")
+        self.num_points = num_points
+        self.pre_trigger = pre_trigger
+        self.mode = mode
+        self.level = level
+        self.slope = slope
+        self.holdoff = holdoff
+        self.ring = ring_buffer(max(1 << 16, 2 * num_points), num_points) # history plus the batch being searched
+        self.chunk_size = self.ring.size - num_points # each write leaves room for the oldest sample a capture could need
+        self.last_value = None # previous sample of the tested signal, so an edge right at a batch boundary isn't missed
+        self.armed_at = 0 # absolute sample index from which the next trigger is accepted
+        self.pending = None # absolute index of a trigger whose capture still needs samples from future batches
+        self.latest = None
+        self.triggers = 0 # captures completed
+
+    # returns the most recent capture completed within this batch, or None
+    def process(self, samples):
+        latest = None
+        for start in range(0, len(samples), self.chunk_size):
+            capture = self._process_chunk(samples[start:start + self.chunk_size])
+            if capture is not None:
+                latest = capture
+        return latest
+
+    def _fired(self, chunk):
+        if self.mode == 'magnitude':
+            value = chunk.real**2 + chunk.imag**2 # compare squared, saves the sqrt
+            level = self.level**2
+        else:
+            value = np.real(chunk)
+            level = self.level
+        above = value >= level if self.slope == 'rising' else value <= level
+        if self.mode == 'level':
+            fired = above
+        else:
+            fired = np.empty(len(chunk), dtype=bool)
+            fired[1:] = above[1:] & ~above[:-1]
+            fired[0] = above[0] and self.last_value is not None and not self.last_value
+            self.last_value = above[-1]
+        return np.flatnonzero(fired)
+
+    def _process_chunk(self, chunk):
+        if len(chunk) == 0:
+            return None
+        first = self.ring.write_count # absolute index of chunk[0]
+        self.ring.write(chunk)
+        end = self.ring.write_count
+        candidates = first + self._fired(chunk)
+        latest_start = None # only the newest capture of the chunk gets copied out of the ring
+        position = 0
+        while True:
+            if self.pending is None:
+                position += np.searchsorted(candidates[position:], self.armed_at)
+                if position == len(candidates):
+                    break
+                t = int(candidates[position])
+                self.armed_at = t + max(self.holdoff, self.num_points - self.pre_trigger)
+                if t - self.pre_trigger < self.ring.read_count:
+                    continue # not enough history yet (start of the stream)
+                self.pending = t
+            capture_start = self.pending - self.pre_trigger
+            if capture_start + self.num_points > end:
+                break # finishes in a later batch
+            latest_start = capture_start
+            self.pending = None
+            self.triggers += 1
+        latest = None
+        if latest_start is not None:
+            latest = np.array(self.ring.peek(self.num_points, latest_start - self.ring.read_count))
+        # keep only what a future capture could still need
+        keep_from = end - self.pre_trigger if self.pending is None else self.pending - self.pre_trigger
+        self.ring.consume(max(0, keep_from - self.ring.read_count))
+        if latest is not None:
+            self.latest = latest
+        return latest
+
+
+##############
+# UNIT TESTS #
+##############
+if __name__ == '__main__': # (call this script directly to run tests)
+    # bursts every 3000 samples at a random phase, fed through in random sized batches
+    x = (0.01 * (np.random.randn(100000) + 1j * np.random.randn(100000))).astype(np.complex64)
+    burst_starts = np.arange(1000, 95000, 3000)
+    for b in burst_starts:
+        x[b:b+500] += np.exp(1j * (np.random.rand() * 2 * np.pi + 0.3 * np.arange(500)))
+    trig = trigger(400, pre_trigger=50, mode='magnitude', level=0.5, holdoff=2000)
+    captures = []
+    i = 0
+    while i < len(x):
+        n = np.random.randint(1, 5000)
+        capture = trig.process(x[i:i+n])
+        if capture is not None:
+            captures.append(capture)
+        i += n
+    aligned = np.all(np.abs(trig.latest[:50]) < 0.2) and np.all(np.abs(trig.latest[50:400]) > 0.5)
+    print("magnitude trigger test passed?", trig.triggers == len(burst_starts) and aligned)
+
+    # sine wave, rising edge through 0 should always land on the same phase
+    t = np.arange(50000)
+    sine = np.sin(2 * np.pi * t / 97.3).astype(np.complex64)
+    trig = trigger(200, pre_trigger=20, mode='edge', level=0.0, holdoff=500)
+    trig.process(sine[:12345])
+    first = trig.latest
+    trig.process(sine[12345:])
+    print("edge trigger test passed?", first[19].real < 0 <= first[20].real and trig.latest[19].real < 0 <= trig.latest[20].real)
+    trig = trigger(200, pre_trigger=20, mode='edge', level=0.5, slope='falling')
+    trig.process(sine)
+    print("falling edge test passed?", trig.latest[19].real > 0.5 >= trig.latest[20].real)
+    trig = trigger(100, mode='level', level=2.0)
+    print("no trigger test passed?", trig.process(sine) is None and trig.latest is None and trig.ring.available() == 0)
@@ -0,0 +1,119 @@
+from __future__ import print_function # allows python3 print() to work in python2
+
+import numpy as np
+import struct
+import time
+import zmq
+
+# ZMQ source and sink blocks, so DSP can be spread across processes (ipc://) or hosts (tcp://) at full rate.
+#   Each message is [topic, header, samples], where the header holds the sample count, a timestamp, and the
+#   numpy dtype string, and the samples go out as a memoryview with copy=False (no pickling, no extra copies).
+#   pattern='pubsub' fans out to any number of subscribers (slow subscribers get dropped by zmq at the HWM),
+#   pattern='pushpull' load balances and the sink blocks (or reports a drop) once the HWM is reached, i.e. backpressure.
+#   raw=True sends/receives bare sample buffers with no topic or header, which is what GNU Radio's ZMQ blocks use
+
+header_format = '<Qd8s' # sample count, timestamp in seconds, dtype string e.g. '<c8'
+header_size = struct.calcsize(header_format)
+
+patterns = {'pubsub': (zmq.PUB, zmq.SUB), 'pushpull': (zmq.PUSH, zmq.PULL)} # (sink socket, source socket)
+
+
+class zmq_sink:
+    def __init__(self, address, pattern='pubsub', hwm=10, bind=True, raw=False, context=None):
+        self.context = context if context is not None else zmq.Context.instance() # inproc:// only works within one context
+        self.socket = self.context.socket(patterns[pattern][0])
+        self.socket.setsockopt(zmq.SNDHWM, hwm) # number of messages that can be queued before blocking/dropping
+        self.socket.setsockopt(zmq.LINGER, 0) # dont hang on close if the other end went away
+        if bind:
+            self.socket.bind(address)
+        else:
+            self.socket.connect(address)
+        self.raw = raw
+        self.dropped = 0 # messages we couldn't send because block=False and the HWM was reached
+
+    # the array is sent zero-copy, so don't write into it again until it has gone out
+    #   (e.g. send usrp_source.recv_buffer.copy(), because usrp_source reuses its buffer on every recv)
+    # returns False if block=False and the message was dropped due to backpressure
+    def send(self, samples, timestamp=None, topic=b'', block=True):
+        samples = np.ascontiguousarray(samples)
+        flags = 0 if block else zmq.NOBLOCK
+        try:
+            if self.raw:
+                self.socket.send(memoryview(samples), flags=flags, copy=False)
+            else:
+                if timestamp is None:
+                    timestamp = time.time()
+                header = struct.pack(header_format, samples.size, timestamp, samples.dtype.str.encode())
+                self.socket.send_multipart([topic, header, memoryview(samples)], flags=flags, copy=False)
+        except zmq.Again:
+            self.dropped += 1
+            return False
+        return True
+
+    def close(self):
+        self.socket.close()
+
+
+class zmq_source:
+    def __init__(self, address, pattern='pubsub', hwm=10, bind=False, raw=False, dtype=np.complex64, topic=b'', context=None):
+        self.context = context if context is not None else zmq.Context.instance()
+        self.socket = self.context.socket(patterns[pattern][1])
+        self.socket.setsockopt(zmq.RCVHWM, hwm)
+        self.socket.setsockopt(zmq.LINGER, 0)
+        if pattern == 'pubsub':
+            self.socket.setsockopt(zmq.SUBSCRIBE, topic) # empty topic means subscribe to everything
+        if bind:
+            self.socket.bind(address)
+        else:
+            self.socket.connect(address)
+        self.raw = raw
+        self.dtype = np.dtype(dtype) # only used in raw mode, otherwise the header says what it is
+        self.timestamp = None # timestamp and topic of the most recent message
+        self.topic = None
+        self.tags = [] # kept for the same interface as usrp_source, zmq messages dont carry tags
+
+    # blocks until a message arrives, or returns None if timeout (in seconds) elapses first
+    # the returned array points straight into the zmq message buffer, it is read-only and stays valid as long as you hold it
+    def recv(self, timeout=None):
+        if timeout is not None and not self.socket.poll(int(timeout * 1000)):
+            return None
+        if self.raw:
+            frame = self.socket.recv(copy=False)
+            self.timestamp = time.time()
+            return np.frombuffer(frame.buffer, dtype=self.dtype)
+        topic, header, payload = self.socket.recv_multipart(copy=False)
+        num_samps, self.timestamp, dtype_str = struct.unpack(header_format, header.bytes)
+        self.topic = topic.bytes
+        samples = np.frombuffer(payload.buffer, dtype=np.dtype(dtype_str.rstrip(b'\x00').decode()))
+        if samples.size != num_samps:
+            raise ValueError("zmq message has %d samples but the header says %d" % (samples.size, num_samps))
+        return samples
+
+    def close(self):
+        self.socket.close()
+
+
+##############
+# UNIT TESTS #
+##############
+if __name__ == '__main__': # (call this script directly to run tests)
+    x = (np.random.randn(2044) + 1j*np.random.randn(2044)).astype(np.complex64)
+
+    # PUSH/PULL with backpressure, over inproc so no hardware or network is needed
+    sink = zmq_sink('inproc://test_pushpull', pattern='pushpull', hwm=2)
+    source = zmq_source('inproc://test_pushpull', pattern='pushpull', hwm=2)
+    sink.send(x, timestamp=1.5)
+    y = source.recv(timeout=1.0)
+    print("push/pull test passed?", np.array_equal(x, y) and source.timestamp == 1.5)
+    sent = [sink.send(x, block=False) for i in range(20)] # nobody is reading, so eventually the HWM kicks in
+    print("backpressure test passed?", not all(sent) and sink.dropped > 0)
+    sink.close()
+    source.close()
+
+    # PUB/SUB fan-out to two subscribers, with a dtype that isn't complex64
+    sink = zmq_sink('inproc://test_pubsub')
+    sources = [zmq_source('inproc://test_pubsub') for i in range(2)]
+    time.sleep(0.1) # subscriptions take a moment to propagate, otherwise the first messages are lost
+    sink.send(np.arange(10, dtype=np.float32), topic=b'psd')
+    results = [s.recv(timeout=1.0) for s in sources]
+    print("pub/sub test passed?", all(np.array_equal(r, np.arange(10)) and r.dtype == np.float32 for r in results) and sources[0].topic == b'psd')
@@ -11,6 +11,7 @@ from PyQt5.QtGui import QIcon
 import pyqtgraph as pg
 import threading
 import time
+import pysdr
 
 # Parameters
 ffts_to_avg = 300
@@ -36,9 +37,9 @@ class Example(QWidget):
         grid = QGridLayout()
         self.setLayout(grid)
         
-        self.time_plot = pg.PlotWidget()
-        self.time_plot_curve1 = self.time_plot.plot([]) 
-        grid.addWidget(self.time_plot, 0, 0)
+        self.freq_sink = pysdr.qtgui.freq_sink(fft_size, sdr.sample_rate, sdr.center_freq)
+        grid.addWidget(self.freq_sink, 0, 0)
+        self.render_timer = pysdr.qtgui.render_timer([self.freq_sink]) # draws on the GUI thread, the rx thread only publishes
 
         self.setGeometry(300, 300, 300, 220)
         self.setWindowTitle('RTL-SDR Demo')
@@ -56,7 +57,7 @@ def rx_thread(rtl, ex):
             fft = np.abs(np.fft.fft(samples[i*fft_size:(i+1)*fft_size]))
             fft_running_avg += fft
         results = 10.0*np.log10(np.fft.fftshift(fft_running_avg/ffts_to_avg))
-        ex.time_plot_curve1.setData(results)
+        ex.freq_sink.publish(results)
         print((time.time() - t0)/time_per_loop)
 
 if __name__ == '__main__':
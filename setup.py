@@ -61,6 +61,7 @@ setup(
         'pyrtlsdr',
         'scipy',
         'pyqt5',
-        'pyqtgraph'
+        'pyqtgraph',
+        'pyzmq'
 ]
 )
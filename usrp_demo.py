@@ -13,6 +13,7 @@ import threading
 import logging
 import numpy as np
 import uhd
+import pysdr
 from PyQt5.QtWidgets import QApplication, QWidget, QGridLayout, QPushButton
 from PyQt5.QtCore import QRect
 import pyqtgraph as pg
@@ -26,7 +27,7 @@ duration = 2 # in seconds
 fft_size = 512
 num_rows = 100
 num_to_avg = 50
-chunk_decimation_factor = 10 # so that we dont processes 100% of samples
+target_utilization = 0.7 # the display only processes as many packets as the CPU can handle while staying under this
 
 CLOCK_TIMEOUT = 1000  # 1000mS timeout for external clock locking
 INIT_DELAY = 0.05  # 50mS initial delay before transmit
@@ -66,52 +67,36 @@ def benchmark_rx_rate(usrp, rx_streamer, timer_elapsed_event, rx_statistics, win
 
     rate = usrp.get_rx_rate()
     # Receive until we get the signal to stop
-    i = 0
     ii = 0
     rx_streamer.recv(recv_buffer, metadata) # to see around what level we are receiving at, to init waterfall 2d array
-    avg_value = np.mean(10.0*np.log10(np.abs(np.fft.fft(recv_buffer[0], fft_size))))
-    data = avg_value * np.ones((fft_size, num_rows))
     running_avg = np.zeros(fft_size)
     first_time = True
-    f = np.linspace(rx_freq - rx_rate/2.0, rx_freq + rx_rate/2.0, fft_size) / 1e6
-    t = np.arange(500)/rx_rate*1e6
+    shedder = pysdr.load_shedder(rx_rate, target_utilization) # decides what fraction of packets the display gets, based on measured load
     while not timer_elapsed_event.is_set():
         try:
-            rx_streamer.recv(recv_buffer, metadata)
-            i += 1
-            if i == chunk_decimation_factor: # used to chunck decimate, so that we dont have to process 100% of samples...
+            num_samps = rx_streamer.recv(recv_buffer, metadata)
+            shedder.begin()
+            if shedder.should_process(): # sheds packets when the CPU can't keep up, instead of always processing 1 in 10
                 running_avg += np.abs(np.fft.fft(recv_buffer[0], fft_size))
-                i = 0
                 ii += 1
                 if ii == num_to_avg:
-                    win.time_plot_curve_i.setData(t, np.real(recv_buffer[0][0:500])) # time plot
-                    win.time_plot_curve_q.setData(t, np.imag(recv_buffer[0][0:500])) # time plot
+                    # the sinks only store what we publish, the GUI thread draws it (touching Qt widgets from this thread isn't safe)
+                    win.time_sink.publish(recv_buffer[0]) # time plot
                     
                     fft = 10.0*np.log10(np.fft.fftshift(running_avg/num_to_avg))
                     
-                    win.fft_plot_curve_fft.setData(f, fft) # FFT plot
-                
-                    # create waterfall
-                    data[:] = np.roll(data, 1, axis=1) # shifts waterfall 1 row
-                    data[:,0] = fft # fill last row with new fft results
-                        
-                    # Display waterfall
-                    win.imageitem.setImage(data) # auto ranges by default
+                    win.freq_sink.publish(fft) # FFT plot
+                    win.waterfall_sink.publish(fft) # adds a row to the waterfall
                     
                     running_avg = np.zeros(fft_size)
                     ii = 0
                     
                     if first_time:
                         first_time = False
-                        # time and freq adjustments
-                        win.time_plot.autoRange()
-                        win.fft_plot.autoRange()
-                        # waterfall adjustments
-                        samples_per_row = len(recv_buffer[0]) * num_to_avg * chunk_decimation_factor / rx_rate
-                        win.imageitem.translate((rx_freq - rx_rate/2.0)/1e6, 0)
-                        win.imageitem.scale(rx_rate/fft_size/1e6, samples_per_row)
-                        win.waterfall.autoRange()
-        
+                        samples_per_row = len(recv_buffer[0]) * num_to_avg / shedder.fraction / rx_rate # approximate, since the fraction keeps adapting
+                        win.waterfall_sink.set_row_duration(samples_per_row) # picked up by the GUI thread on the next render
+            if num_samps > 0:
+                shedder.end(num_samps) # measures utilization, which the shedder uses to adapt the fraction
                 
         except RuntimeError as ex:
             logger.error("Runtime error in receive: %s", ex)
@@ -173,27 +158,19 @@ class Example(QWidget):
         
         
         # create time plot
-        self.time_plot = pg.PlotWidget(labels={'left': 'Amplitude', 'bottom': 'Time [microseconds]'}, enableMenu=False)
-        self.time_plot.getPlotItem().getViewBox().setMouseMode(pg.ViewBox.RectMode)
-        self.time_plot.setMouseEnabled(x=False, y=True)
-        self.time_plot_curve_i = self.time_plot.plot([]) 
-        self.time_plot_curve_q = self.time_plot.plot([]) 
-        grid.addWidget(self.time_plot, 1, 0)
+        self.time_sink = pysdr.qtgui.time_sink(500, rx_rate)
+        grid.addWidget(self.time_sink, 1, 0)
         
         # create fft plot
-        self.fft_plot = pg.PlotWidget(labels={'left': 'PSD', 'bottom': 'Frequency [MHz]'}, enableMenu=False)
-        self.fft_plot.getPlotItem().getViewBox().setMouseMode(pg.ViewBox.RectMode)
-        self.fft_plot.setMouseEnabled(x=False, y=True)
-        self.fft_plot_curve_fft = self.fft_plot.plot([]) 
-        grid.addWidget(self.fft_plot, 2, 0)
+        self.freq_sink = pysdr.qtgui.freq_sink(fft_size, rx_rate, rx_freq)
+        grid.addWidget(self.freq_sink, 2, 0)
         
         # Create waterfall plot
-        self.waterfall = pg.PlotWidget(labels={'left': 'Time [s]', 'bottom': 'Frequency [MHz]'}, enableMenu=False)
-        self.waterfall.getPlotItem().getViewBox().translateBy(x=10.0)
-        self.imageitem = pg.ImageItem()
-        self.waterfall.addItem(self.imageitem)
-        self.waterfall.setMouseEnabled(x=False, y=False)
-        grid.addWidget(self.waterfall, 3, 0)
+        self.waterfall_sink = pysdr.qtgui.waterfall_sink(fft_size, num_rows, rx_rate, rx_freq, auto_levels=True) # the PSD below isn't normalized, so let the levels follow it
+        grid.addWidget(self.waterfall_sink, 3, 0)
+        
+        # draws whatever the rx thread published most recently, on the GUI thread
+        self.render_timer = pysdr.qtgui.render_timer([self.time_sink, self.freq_sink, self.waterfall_sink], fps=30)
   
         self.setGeometry(300, 300, 300, 220) # window placement and size
         self.setWindowTitle('RTL-SDR Demo')
@@ -201,8 +178,9 @@ class Example(QWidget):
         self.show() # not blocking
         
     def handleButton(self):
-        self.time_plot.autoRange()
-        self.fft_plot.autoRange()
+        self.time_sink.autoRange()
+        self.freq_sink.autoRange()
+        self.waterfall_sink.autoRange()
                     
             
 if __name__ == "__main__":